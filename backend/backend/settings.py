@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import datetime
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,11 +45,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',  # 添加 DRF
     'corsheaders',     # 添加 CORS
+    'django_filters',  # 列表过滤
     'accounts',        # 添加应用
     'tax_forms',
 ]
 
 MIDDLEWARE = [
+    'tax_forms.instrumentation.RequestTimingMiddleware',  # 请求计时，REQUEST_TIMING 为 True 时启用
     'corsheaders.middleware.CorsMiddleware',  # 添加 CORS 中间件
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -79,11 +86,105 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite 配置：
+# - WAL 日志模式下读写互不阻塞，synchronous=NORMAL 只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库；
+# - busy_timeout 让写入在数据库被锁时等待而不是立即报 database is locked；
+# - 事务以 BEGIN IMMEDIATE 开始，避免先读后写的事务在升级写锁时失败；
+# - mmap_size、cache_size 减少读取时的系统调用和页面换入；
+# - CONN_MAX_AGE 复用连接，省去每个请求重新连接和执行 PRAGMA 的开销。
+# 数据库文件不要放在网络文件系统上，WAL 依赖共享内存，多个容器共享时须在同一台主机上。
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # 毫秒
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # 负数单位为 KiB，即 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+# 数据库由环境变量 DJANGO_DB_ENGINE 选择：sqlite（默认）或 postgresql
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'backend.sqlite3',
+            'NAME': os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # 测试数据库使用文件而不是内存，以便并发测试使用与生产相同的锁机制
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+elif DB_ENGINE == 'postgresql':
+    # PostgreSQL 配置：
+    # - CONN_MAX_AGE 让每个工作进程保持长连接，连接数约等于工作进程数；
+    #   进程较多时在前面加 PgBouncer 做连接池，事务池模式下须设置 DJANGO_DB_DISABLE_SERVER_SIDE_CURSORS=1；
+    # - 导出等大批量读取使用 QuerySet.iterator()，在 PostgreSQL 上走服务端游标，分批取回，内存占用恒定；
+    # - 从现有 SQLite 迁移数据：python manage.py migrate && python manage.py copy_from_sqlite db.sqlite3
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'tax'),
+            'USER': os.environ.get('POSTGRES_USER', 'tax'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DJANGO_DB_DISABLE_SERVER_SIDE_CURSORS') == '1',
+            'OPTIONS': {
+                'connect_timeout': 10,
+                'application_name': 'tax-backend',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'不支持的 DJANGO_DB_ENGINE: {DB_ENGINE}，可选 sqlite 或 postgresql')
+
+# 只读副本：列表、导出、统计和增量同步从副本读取（见 TaxFormViewSet.replica_actions），写入始终在主库。
+# SQLite 可用 Litestream 等工具同步出的文件作为副本，PostgreSQL 为流复制备库。
+# 测试时副本指向测试主库（MIRROR），不单独建库。
+if DB_ENGINE == 'sqlite' and os.environ.get('DJANGO_REPLICA_SQLITE_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DJANGO_REPLICA_SQLITE_PATH'],
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_ENGINE == 'postgresql' and os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+        'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['tax_forms.routers.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # 税务表单序列化结果缓存，按 (表单ID, 版本号) 存储，超过 MAX_ENTRIES 时淘汰最久未访问的条目
+    # 多进程部署可改用 django.core.cache.backends.filebased.FileBasedCache 以便进程间共享
+    'tax_forms': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tax-forms',
+        'TIMEOUT': None,
+        'VERSION': 2,  # 序列化器输出格式变化时递增
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
 
 
@@ -136,6 +237,8 @@ CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",  # 前端开发服务器
 ]
+CORS_EXPOSE_HEADERS = ['X-Total-Count', 'ETag', 'Server-Timing']  # 允许前端读取分页总数、ETag 和计时响应头
+CORS_ALLOW_HEADERS = list(default_headers) + ['if-match', 'if-none-match']  # 条件请求
 
 AUTH_USER_MODEL = 'accounts.User'  # 设置自定义用户模型
 
@@ -145,3 +248,12 @@ AUTH_USER_MODEL = 'accounts.User'  # 设置自定义用户模型
 SESSION_COOKIE_SECURE = False  # 开发环境下设为False，生产环境应为True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'  # 或者对于API设置为'None'
+
+# 请求计时：在 Server-Timing 响应头中返回 SQL 次数和各阶段耗时，并汇总到 /api/timings/
+REQUEST_TIMING = os.environ.get('DJANGO_REQUEST_TIMING') == '1'
+
+# 增量同步：返回的游标比当前时间早 SYNC_OVERLAP，覆盖时间戳已写入但事务尚未提交的修改，
+# 重叠窗口内的表单可能重复返回，客户端按版本号去重
+SYNC_OVERLAP = datetime.timedelta(seconds=int(os.environ.get('DJANGO_SYNC_OVERLAP_SECONDS', '60')))
+# 已删除表单记录的保留期限，since 早于该期限的增量同步需要全量重新同步
+TOMBSTONE_RETENTION = datetime.timedelta(days=int(os.environ.get('DJANGO_TOMBSTONE_RETENTION_DAYS', '30')))
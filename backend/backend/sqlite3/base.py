@@ -0,0 +1,42 @@
+"""
+SQLite 数据库后端，在 Django 自带后端的基础上增加两个 OPTIONS：
+
+- init_command：每个新连接建立后执行的 SQL（通常是一组 PRAGMA），多条语句用分号分隔；
+- transaction_mode：显式事务使用的 BEGIN 类型（DEFERRED / IMMEDIATE / EXCLUSIVE）。
+
+两者与 Django 5.1 起自带 SQLite 后端的同名选项含义一致，升级后可直接改回默认后端。
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = {'DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop('init_command', None)
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'settings.DATABASES 中 transaction_mode 的取值应为 {sorted(TRANSACTION_MODES)} 之一')
+        self.transaction_mode = transaction_mode and transaction_mode.upper()
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # 默认的 BEGIN 为 DEFERRED：事务先读后写时，若期间有其他连接提交了写入，
+        # 升级为写锁会立即失败（database is locked），busy_timeout 不起作用。
+        # IMMEDIATE 在事务开始时就取得写锁，拿不到时按 busy_timeout 等待。
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -16,8 +16,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from tax_forms.instrumentation import TimingStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
     path('api/tax-forms/', include('tax_forms.urls')),
+    path('api/timings/', TimingStatsView.as_view()),
 ]
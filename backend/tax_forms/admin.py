@@ -1,74 +1,52 @@
 from django.contrib import admin
-from .models import (
-    TaxForm, TaxInfo, DailyManagement, RiskAlert, Interview,
-    TaxPaymentPlan, TaxpayerReport, TaxpayerAssets,
-    Collection, TaxPaymentWithAssets
-)
+from .models import TaxForm, RiskAlert, TaxFormAssignment, AuthorityAssignment, FORM_SECTIONS
 
-class TaxInfoInline(admin.StackedInline):
-    model = TaxInfo
-    can_delete = False
-
-class DailyManagementInline(admin.StackedInline):
-    model = DailyManagement
-    can_delete = False
-
-class CollectionInline(admin.StackedInline):
-    model = Collection
-    can_delete = False
-
-class TaxPaymentWithAssetsInline(admin.StackedInline):
-    model = TaxPaymentWithAssets
-    can_delete = False
+class RiskAlertInline(admin.TabularInline):
+    model = RiskAlert
+    extra = 0
 
 @admin.register(TaxForm)
 class TaxFormAdmin(admin.ModelAdmin):
     list_display = ('id', 'month', 'taxpayer_name', 'credit_code', 'taxpayer_status', 'status')
     list_filter = ('month', 'taxpayer_status', 'status')
     search_fields = ('taxpayer_name', 'credit_code')
-    inlines = [TaxInfoInline, DailyManagementInline, CollectionInline, TaxPaymentWithAssetsInline]
+    # 原各子表的字段按部分分组显示
+    fieldsets = [
+        (None, {'fields': ('month', 'taxpayer_name', 'credit_code', 'taxpayer_status', 'industry',
+                           'tax_authority_code', 'tax_authority_name', 'status')}),
+    ] + [
+        (section.verbose_name, {
+            'fields': ([section.presence_field] if section.presence_field else []) + section.columns,
+            'classes': ('collapse',),
+        })
+        for section in FORM_SECTIONS
+    ]
+    inlines = [RiskAlertInline]
 
 @admin.register(RiskAlert)
 class RiskAlertAdmin(admin.ModelAdmin):
     list_display = ('id', 'get_taxpayer_name', 'document', 'delivery_date')
-    search_fields = ('document', 'daily_management__tax_form__taxpayer_name')
-    
-    def get_taxpayer_name(self, obj):
-        return obj.daily_management.tax_form.taxpayer_name
-    get_taxpayer_name.short_description = '纳税人名称'
-
-@admin.register(Interview)
-class InterviewAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_taxpayer_name', 'has_interview', 'document', 'interview_date')
-    list_filter = ('has_interview',)
+    search_fields = ('document', 'tax_form__taxpayer_name')
+    raw_id_fields = ('tax_form',)
     
     def get_taxpayer_name(self, obj):
-        return obj.daily_management.tax_form.taxpayer_name
+        return obj.tax_form.taxpayer_name
     get_taxpayer_name.short_description = '纳税人名称'
 
-@admin.register(TaxPaymentPlan)
-class TaxPaymentPlanAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_taxpayer_name', 'has_agreement', 'month_count')
-    list_filter = ('has_agreement',)
-    
-    def get_taxpayer_name(self, obj):
-        return obj.daily_management.tax_form.taxpayer_name
-    get_taxpayer_name.short_description = '纳税人名称'
+@admin.register(TaxFormAssignment)
+class TaxFormAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'get_taxpayer_name', 'month', 'assignee', 'assigned_at')
+    list_filter = ('month',)
+    search_fields = ('tax_form__taxpayer_name', 'assignee__username')
+    raw_id_fields = ('tax_form',)
 
-@admin.register(TaxpayerReport)
-class TaxpayerReportAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_taxpayer_name')
-    
     def get_taxpayer_name(self, obj):
-        return obj.daily_management.tax_form.taxpayer_name
+        return obj.tax_form.taxpayer_name
     get_taxpayer_name.short_description = '纳税人名称'
 
-@admin.register(TaxpayerAssets)
-class TaxpayerAssetsAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_taxpayer_name')
-    
-    def get_taxpayer_name(self, obj):
-        return obj.daily_management.tax_form.taxpayer_name
-    get_taxpayer_name.short_description = '纳税人名称'
+@admin.register(AuthorityAssignment)
+class AuthorityAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tax_authority_code', 'assignee', 'assigned_at')
+    search_fields = ('tax_authority_code', 'assignee__username')
 
 # 其他模型也可以根据需要注册，这里只展示主要的几个
@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TaxForm, TaxFormAssignment, TaxFormTombstone, AuthorityAssignment
+
+
+class FormAssigner:
+    """
+    批量分配表单负责人，assignee 为 None 时取消分配。
+
+    已有分配记录用一条 UPDATE 改为新负责人，缺少的用一条批量 INSERT 补齐；
+    无论按表单还是按主管税务机关分配，草稿状态的表单都改为“已分配”，
+    取消分配后没有任何负责人的“已分配”表单退回草稿。
+
+    表单不再对原负责人可见时，为原负责人写入删除记录，其客户端增量同步时移除该表单。
+    """
+
+    def __init__(self, assignee, assigned_by=None):
+        self.assignee = assignee
+        self.assigned_by = assigned_by
+
+    def assign(self, form_ids):
+        """返回实际分配（或取消分配）的表单ID"""
+        now = timezone.now()
+        with transaction.atomic():
+            months = dict(TaxForm.objects.filter(id__in=form_ids).values_list('id', 'month'))
+            assignments = TaxFormAssignment.objects.filter(tax_form_id__in=months)
+            moved = list(
+                (assignments.exclude(assignee=self.assignee) if self.assignee else assignments)
+                .values_list('tax_form_id', 'month', 'assignee_id')
+            )
+            self.record_unassigned(moved)
+            moved_ids = {pk for pk, _, _ in moved}
+            if self.assignee is None:
+                assignments.delete()
+                self.change_status(self.unassigned(months), 'assigned', 'draft', now)
+                return sorted(months)
+
+            existing = set(assignments.values_list('tax_form_id', flat=True))
+            assignments.update(assignee=self.assignee, assigned_by=self.assigned_by, assigned_at=now)
+            TaxFormAssignment.objects.bulk_create(
+                TaxFormAssignment(tax_form_id=pk, month=month, assignee=self.assignee,
+                                  assigned_by=self.assigned_by)
+                for pk, month in months.items() if pk not in existing
+            )
+            self.change_status(months, 'draft', 'assigned', now)
+            # 换了负责人的表单递增版本号，新负责人增量同步时能取到
+            TaxForm.objects.filter(id__in=moved_ids).touch()
+        return sorted(months)
+
+    @staticmethod
+    def change_status(form_ids, current, target, now):
+        return TaxForm.objects.filter(id__in=form_ids, status=current) \
+            .update(status=target, updated_at=now, version=F('version') + 1)
+
+    @staticmethod
+    def unassigned(form_ids):
+        """既没有表单分配记录、所属主管税务机关也未分配负责人的表单"""
+        return TaxForm.objects.filter(id__in=form_ids, assignment__isnull=True).exclude(
+            tax_authority_code__in=AuthorityAssignment.objects.values('tax_authority_code'),
+        ).values('id')
+
+    @staticmethod
+    def record_unassigned(rows):
+        """rows 为 (表单ID, 月度, 原负责人ID)"""
+        TaxFormTombstone.objects.bulk_create(
+            TaxFormTombstone(form_id=pk, month=month, assignee_id=assignee_id)
+            for pk, month, assignee_id in rows
+        )
+
+    def assign_authorities(self, codes):
+        """按主管税务机关分配，取消分配时删除该机关的全部分配记录"""
+        codes = set(codes)
+        now = timezone.now()
+        forms = TaxForm.objects.filter(tax_authority_code__in=codes)
+        with transaction.atomic():
+            if self.assignee is None:
+                removed = AuthorityAssignment.objects.filter(tax_authority_code__in=codes)
+                self.record_unassigned(
+                    (pk, month, assignee_id)
+                    for assignee_id, code in removed.values_list('assignee_id', 'tax_authority_code')
+                    for pk, month in forms.filter(tax_authority_code=code).values_list('id', 'month')
+                )
+                removed.delete()
+                self.change_status(self.unassigned(forms.values('id')), 'assigned', 'draft', now)
+                return sorted(codes)
+            existing = set(
+                AuthorityAssignment.objects.filter(assignee=self.assignee, tax_authority_code__in=codes)
+                .values_list('tax_authority_code', flat=True)
+            )
+            AuthorityAssignment.objects.bulk_create(
+                AuthorityAssignment(assignee=self.assignee, tax_authority_code=code, assigned_by=self.assigned_by)
+                for code in codes - existing
+            )
+            self.change_status(forms.values('id'), 'draft', 'assigned', now)
+        return sorted(codes)
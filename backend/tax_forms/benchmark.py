@@ -0,0 +1,154 @@
+import csv
+import io
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.core.cache import caches, InvalidCacheBackendError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .form_cache import CACHE_ALIAS
+from .models import TaxForm
+from .synthetic import LedgerGenerator
+
+API = '/api/tax-forms/'
+
+
+def percentile(values, percent):
+    """最近秩法百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class ApiBenchmark:
+    """
+    通过 Django 测试客户端逐个场景请求 API，统计延迟、每个请求的 SQL 次数和内存峰值。
+
+    每个场景先清空序列化缓存，再连续请求 iterations 次计时（list_month_cold 每次请求前都清空）；
+    内存峰值在计时之后用 tracemalloc 单独再请求一次测得，避免跟踪开销影响延迟。
+    结果为可直接写入 JSON 的字典，便于不同版本之间比对。
+    """
+
+    def __init__(self, user, iterations=20, page_size=100, bulk_size=100, seed=0):
+        self.user = user
+        self.iterations = iterations
+        self.page_size = page_size
+        self.bulk_size = bulk_size
+        self.generator = LedgerGenerator(companies=0, months=1, seed=seed)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def scenarios(self):
+        month = TaxForm.objects.order_by('-month').values_list('month', flat=True).first()
+        ids = list(TaxForm.objects.filter(month=month).order_by('id').values_list('id', flat=True))
+        if not ids:
+            raise ValueError('没有可用于基准测试的表单，请先生成台账')
+        controls = [choice for choice, _ in TaxForm.INVOICE_CONTROL_CHOICES]
+
+        def pick(i):
+            return ids[i * 7919 % len(ids)]
+
+        return {
+            'list_page': lambda i: self.client.get(API, {'month': month, 'page_size': self.page_size}),
+            'list_month': lambda i: self.client.get(API, {'month': month}),
+            # 每次请求前清空序列化缓存，衡量整月表单全部重新读取和序列化的吞吐量
+            'list_month_cold': self.uncached(lambda i: self.client.get(API, {'month': month})),
+            'list_sparse': lambda i: self.client.get(API, {
+                'month': month, 'page_size': self.page_size,
+                'fields': 'taxpayer_name,credit_code,daily_management.invoice_control,collection'}),
+            'retrieve': lambda i: self.client.get(f'{API}{pick(i)}/'),
+            'patch': lambda i: self.client.patch(
+                f'{API}{pick(i)}/', {'daily_management': {'invoice_control': controls[i % len(controls)]}},
+                format='json'),
+            'bulk_create': lambda i: self.client.post(
+                f'{API}import/', {'file': self.roster_file(), 'month': month}, format='multipart'),
+            'export_csv': lambda i: self.client.get(f'{API}export/', {'month': month, 'export_format': 'csv'}),
+        }
+
+    def uncached(self, request):
+        def run(i):
+            self.clear_cache()
+            return request(i)
+        return run
+
+    def roster_file(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['taxpayer_name', 'credit_code', 'tax_authority_code', 'tax_authority_name'])
+        for _ in range(self.bulk_size):
+            writer.writerow([self.generator.company_name('贸易'), self.generator.credit_code(),
+                             '13305033100', '南浔税务所'])
+        return SimpleUploadedFile('roster.csv', output.getvalue().encode('utf-8-sig'), content_type='text/csv')
+
+    def run(self, names=None):
+        scenarios = self.scenarios()
+        results = {}
+        for name, request in scenarios.items():
+            if names and name not in names:
+                continue
+            results[name] = self.measure(request)
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'forms': TaxForm.objects.count(),
+                'iterations': self.iterations,
+                'page_size': self.page_size,
+                'bulk_size': self.bulk_size,
+            },
+            'scenarios': results,
+        }
+
+    def measure(self, request):
+        self.clear_cache()
+        latencies, queries, statuses = [], [], {}
+        for i in range(self.iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = request(i)
+                self.consume(response)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(ctx.captured_queries))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        tracemalloc.start()
+        try:
+            self.consume(request(self.iterations))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'requests': self.iterations,
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'max_ms': round(max(latencies), 3),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    @staticmethod
+    def consume(response):
+        """流式响应需要读完内容才算请求结束，测试客户端在读完后自行关闭响应"""
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    @staticmethod
+    def clear_cache():
+        try:
+            caches[CACHE_ALIAS].clear()
+        except InvalidCacheBackendError:
+            pass
@@ -0,0 +1,103 @@
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import TaxForm, TaxFormAssignment, SECTIONS
+from .serializers import TaxFormSerializer
+from .summary import affects_summary, refresh_months_on_commit
+
+
+def bulk_create_with_ids(model, objs, batch_size=None):
+    """
+    批量插入并为每个对象回填主键。
+
+    PostgreSQL 通过 INSERT ... RETURNING 直接回填；
+    SQLite 在 Django 3.2 下不支持回填，由于调用方处于事务中且已持有写锁，
+    本次插入的行必然是表中主键最大的 len(objs) 行，按顺序回填即可。
+    必须在 transaction.atomic() 中调用。
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    db = router.db_for_write(model)
+    model.objects.using(db).bulk_create(objs, batch_size=batch_size)
+    if connections[db].features.can_return_rows_from_bulk_insert:
+        return objs
+
+    pks = list(
+        model.objects.using(db).order_by('-pk').values_list('pk', flat=True)[:len(objs)]
+    )
+    pks.reverse()
+    for obj, pk in zip(objs, pks):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = db
+    return objs
+
+
+class BulkFill:
+    """
+    类似 Excel 填充的批量更新，如把 daily_management.invoice_control 设为同一个值。
+
+    字段值先按 TaxFormSerializer 中对应字段校验，各部分的字段都在表单本身的行中，
+    所有表单只执行一条 UPDATE；可选的部分同时标记为已填写。
+    """
+
+    # 状态只能按审批规则变更（见 transitions），不能直接填充
+    transition_fields = {'status'}
+
+    def __init__(self, values, is_admin=False):
+        self.root = TaxFormSerializer()
+        self.is_admin = is_admin
+        # 表单列名 -> 校验后的值
+        self.changes = {}
+        errors = {}
+        for path, value in values.items():
+            try:
+                column, field = self.resolve(path)
+                self.changes[column] = field.run_validation(value)
+            except serializers.ValidationError as exc:
+                errors[path] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        if not self.changes:
+            raise serializers.ValidationError({'values': '没有需要更新的字段'})
+
+    def resolve(self, path):
+        prefix, _, name = path.rpartition('.')
+        section = SECTIONS.get(prefix)
+        if prefix and section is None:
+            raise serializers.ValidationError('不支持的字段路径')
+        serializer = self.root
+        for part in filter(None, prefix.split('.')):
+            serializer = serializer.fields[part]
+        if section is None and name in self.transition_fields:
+            raise serializers.ValidationError('表单状态请通过 bulk-transition 变更')
+        field = serializer.fields.get(name)
+        if field is None or field.read_only or isinstance(field, serializers.BaseSerializer):
+            raise serializers.ValidationError('不支持的字段路径')
+        admin_only_fields = section.admin_only_fields if section else TaxForm.admin_only_fields
+        if not self.is_admin and name in admin_only_fields:
+            raise serializers.ValidationError('该字段仅管理员可填写')
+        if section is None:
+            return name, field
+        if section.presence_field:
+            self.changes[section.presence_field] = True
+        return section.column(name), field
+
+    def apply(self, form_ids):
+        """更新指定表单并返回新的 updated_at"""
+        form_ids = list(form_ids)
+        now = timezone.now()
+        with transaction.atomic():
+            if affects_summary(TaxForm, self.changes):
+                # 汇总按月度维护，修改月度时新旧月度都需要刷新
+                months = set(TaxForm.objects.filter(id__in=form_ids).values_list('month', flat=True).distinct())
+                months.add(self.changes.get('month'))
+                refresh_months_on_commit(months)
+            if 'month' in self.changes:
+                TaxFormAssignment.objects.filter(tax_form_id__in=form_ids).update(month=self.changes['month'])
+            TaxForm.objects.filter(id__in=form_ids).update(
+                **self.changes, updated_at=now, version=F('version') + 1)
+        return now
@@ -0,0 +1,159 @@
+import re
+import time
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .summary import lock_months, refresh_months_on_commit
+from .models import TaxForm, RiskAlert, TaxFormAssignment
+
+MONTH_RE = re.compile(r'^\d{4}(0[1-9]|1[0-2])$')
+
+
+def previous_month(month):
+    """'202501' -> '202412'"""
+    year, mon = int(month[:4]), int(month[4:])
+    if mon == 1:
+        return f'{year - 1}12'
+    return f'{year}{mon - 1:02d}'
+
+
+def copied_columns(model, exclude):
+    """模型中需要原样复制的列（排除主键和指定字段）"""
+    return [
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in exclude
+    ]
+
+
+class CarryForward:
+    """
+    将上月欠税余额大于 0 的表单结转到新月度。
+
+    表单（含其各部分）、风险提醒和分配记录各只执行一条 INSERT ... SELECT，整个结转在一个事务内完成；
+    来源表单已分配负责人时，结转出的表单沿用该负责人并处于“已分配”状态。
+    已结转过（carried_from 指向同一来源）或本月已存在相同信用代码的表单会被跳过，
+    因此对同一月度重复执行是幂等的。
+    """
+
+    def __init__(self, month, source_month=None):
+        if not month or not MONTH_RE.match(month):
+            raise ValueError(f'无效的月度: {month}')
+        source_month = source_month or previous_month(month)
+        if not MONTH_RE.match(source_month):
+            raise ValueError(f'无效的月度: {source_month}')
+        self.month = month
+        self.source_month = source_month
+        self.db = router.db_for_write(TaxForm)
+        self.connection = connections[self.db]
+        self.qn = self.connection.ops.quote_name
+
+    def table(self, model):
+        return self.qn(model._meta.db_table)
+
+    def column(self, model, name):
+        return self.qn(model._meta.get_field(name).column)
+
+    def run(self):
+        started = time.monotonic()
+        copied = {}
+        # 本次结转的表单由月度、carried_from 和统一的创建时间识别，不依赖其他请求并发写入的行
+        self.now = timezone.now()
+        with transaction.atomic(using=self.db), self.connection.cursor() as cursor:
+            # 同一月度的结转依次进行，后执行的一次能看到前一次写入的表单，NOT EXISTS 判断才可靠
+            lock_months({self.month}, self.db)
+            cursor.execute(*self.copy_forms_sql())
+            copied[TaxForm._meta.db_table] = cursor.rowcount
+            if cursor.rowcount:
+                cursor.execute(*self.copy_risk_alerts_sql())
+                copied[RiskAlert._meta.db_table] = cursor.rowcount
+                cursor.execute(*self.copy_assignments_sql())
+                copied[TaxFormAssignment._meta.db_table] = cursor.rowcount
+                if cursor.rowcount:
+                    TaxForm.objects.using(self.db) \
+                        .filter(month=self.month, carried_from__isnull=False, created_at=self.now,
+                                assignment__isnull=False) \
+                        .update(status='assigned', version=F('version') + 1)
+                refresh_months_on_commit({self.month}, self.db)
+
+        return {
+            'month': self.month,
+            'source_month': self.source_month,
+            'forms': copied[TaxForm._meta.db_table],
+            'copied': copied,
+            'elapsed': round(time.monotonic() - started, 3),
+        }
+
+    def adapted_now(self):
+        return self.connection.ops.adapt_datetimefield_value(self.now)
+
+    def carried_rows_sql(self, alias):
+        """本次结转新建的表单"""
+        return (
+            f'{alias}.{self.column(TaxForm, "month")} = %s AND {alias}.{self.column(TaxForm, "carried_from")} '
+            f'IS NOT NULL AND {alias}.{self.column(TaxForm, "created_at")} = %s'
+        ), [self.month, self.adapted_now()]
+
+    def copy_forms_sql(self):
+        now = self.adapted_now()
+        # 月度、状态和时间戳使用新值，carried_from 记录来源表单，其余列原样复制
+        overrides = [
+            ('month', self.month),
+            ('status', 'draft'),
+            ('version', 1),
+            ('created_at', now),
+            ('updated_at', now),
+        ]
+        columns = copied_columns(TaxForm, exclude={name for name, _ in overrides} | {'carried_from'})
+
+        form = self.table(TaxForm)
+        pk = self.column(TaxForm, 'id')
+        month = self.column(TaxForm, 'month')
+        credit_code = self.column(TaxForm, 'credit_code')
+        carried_from = self.column(TaxForm, 'carried_from')
+
+        insert_columns = [self.qn(c) for c in columns] \
+            + [self.column(TaxForm, name) for name, _ in overrides] + [carried_from]
+        select = [f's.{self.qn(c)}' for c in columns] + ['%s'] * len(overrides) + [f's.{pk}']
+        sql = (
+            f'INSERT INTO {form} ({", ".join(insert_columns)}) '
+            f'SELECT {", ".join(select)} FROM {form} s '
+            f'WHERE s.{month} = %s AND s.{self.column(TaxForm, "tax_info_outstanding_tax")} > 0 '
+            f'AND NOT EXISTS (SELECT 1 FROM {form} t WHERE t.{month} = %s '
+            f'AND (t.{carried_from} = s.{pk} OR t.{credit_code} = s.{credit_code})) '
+            f'ORDER BY s.{pk}'
+        )
+        return sql, [value for _, value in overrides] + [self.source_month, self.month]
+
+    def copy_risk_alerts_sql(self):
+        """新表单 n 通过 carried_from 找到来源表单的风险提醒并复制"""
+        columns = copied_columns(RiskAlert, exclude={'tax_form'})
+        form, alert = self.table(TaxForm), self.table(RiskAlert)
+        fk = self.column(RiskAlert, 'tax_form')
+        pk = self.column(TaxForm, 'id')
+        where, params = self.carried_rows_sql('n')
+        sql = (
+            f'INSERT INTO {alert} ({fk}, {", ".join(self.qn(c) for c in columns)}) '
+            f'SELECT n.{pk}, {", ".join(f"c.{self.qn(c)}" for c in columns)} FROM {form} n '
+            f'INNER JOIN {alert} c ON c.{fk} = n.{self.column(TaxForm, "carried_from")} '
+            f'WHERE {where} ORDER BY n.{pk}, c.{self.column(RiskAlert, "id")}'
+        )
+        return sql, params
+
+    def copy_assignments_sql(self):
+        """新表单 n 通过 carried_from 找到来源表单的分配记录并复制，月度和分配时间使用新值"""
+        columns = copied_columns(TaxFormAssignment, exclude={'tax_form', 'month', 'assigned_at'})
+        form, assignment = self.table(TaxForm), self.table(TaxFormAssignment)
+        fk = self.column(TaxFormAssignment, 'tax_form')
+        pk = self.column(TaxForm, 'id')
+        insert_columns = [fk, self.column(TaxFormAssignment, 'month'),
+                          self.column(TaxFormAssignment, 'assigned_at')] + [self.qn(c) for c in columns]
+        where, params = self.carried_rows_sql('n')
+        sql = (
+            f'INSERT INTO {assignment} ({", ".join(insert_columns)}) '
+            f'SELECT n.{pk}, %s, %s, {", ".join(f"a.{self.qn(c)}" for c in columns)} FROM {form} n '
+            f'INNER JOIN {assignment} a ON a.{fk} = n.{self.column(TaxForm, "carried_from")} '
+            f'WHERE {where} ORDER BY n.{pk}'
+        )
+        return sql, [self.month, self.adapted_now()] + params
@@ -0,0 +1,172 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.apps import apps
+from django.contrib.auth.models import Group, Permission
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+# 需要复制的应用，权限、会话、后台日志等由目标库 migrate 自行生成或无需迁移
+COPIED_APPS = ['accounts', 'tax_forms']
+# 其他应用中需要复制的模型：用户组是用户数据，migrate 不会生成
+COPIED_MODELS = [Group]
+
+
+class DatabaseCopyError(Exception):
+    """源库与目标库不能直接复制（迁移版本不一致等）"""
+
+
+def register_sqlite(alias, path):
+    """把 SQLite 文件注册为临时数据库别名"""
+    connections.databases[alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)}
+    connections.ensure_defaults(alias)
+    connections.prepare_test_settings(alias)
+
+
+def unregister(alias):
+    """关闭并注销 register_sqlite 注册的别名"""
+    connections[alias].close()
+    del connections[alias]
+    del connections.databases[alias]
+
+
+@contextmanager
+def keep_timestamps(model):
+    """bulk_create 会用当前时间覆盖 auto_now / auto_now_add 字段，复制期间暂时关闭"""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class DatabaseCopier:
+    """
+    把台账从一个数据库原样复制到另一个数据库（如 SQLite -> PostgreSQL），保留主键。
+
+    按外键依赖顺序逐表复制，每批读取 batch_size 行并用一条多行 INSERT 写入，
+    用户与用户组、权限的多对多关联在两端的表复制完成后复制，
+    整个复制在目标库的一个事务内完成，失败时目标库不留下部分数据。
+    源库和目标库都必须已迁移到当前代码的最新版本。
+    复制完成后重置目标库的自增序列，之后新建的记录从最大 ID 之后继续编号。
+    目标库需已执行 migrate 且这些表为空。
+    """
+
+    def __init__(self, source, target, batch_size=2000):
+        self.source = source
+        self.target = target
+        self.batch_size = batch_size
+
+    def models(self):
+        app_list = [(apps.get_app_config(label), None) for label in COPIED_APPS]
+        app_list += [(model._meta.app_config, [model]) for model in COPIED_MODELS]
+        return [model for model in sort_dependencies(app_list)
+                if model._meta.managed and not model._meta.proxy]
+
+    def through_models(self):
+        """自动生成的多对多中间表（如用户与用户组、权限的关联），在两端的表复制完成后复制"""
+        return [field.remote_field.through for model in self.models() for field in model._meta.local_many_to_many
+                if field.remote_field.through._meta.auto_created]
+
+    def non_empty_tables(self):
+        return [model._meta.db_table for model in self.models() + self.through_models()
+                if model._default_manager.using(self.target).exists()]
+
+    def check_migrations(self):
+        """
+        源库和目标库都应已迁移到当前代码的最新版本，否则表结构不同，
+        复制会中途失败或把数据写进错误的列。
+        """
+        labels = {model._meta.app_label for model in self.models() + self.through_models()}
+        graph = MigrationLoader(connections[self.target], ignore_no_migrations=True).graph
+        leaves = {node for node in graph.leaf_nodes() if node[0] in labels}
+        for alias in (self.source, self.target):
+            applied = {key for key in MigrationRecorder(connections[alias]).applied_migrations()
+                       if key[0] in labels}
+            missing = sorted(f'{app}.{name}' for app, name in leaves - applied)
+            unknown = sorted(f'{app}.{name}' for app, name in applied if (app, name) not in graph.nodes)
+            if missing or unknown:
+                name = connections[alias].settings_dict['NAME']
+                raise DatabaseCopyError(
+                    f'数据库 {name} 的迁移版本与代码不一致'
+                    + (f'，未执行: {", ".join(missing)}' if missing else '')
+                    + (f'，代码中不存在: {", ".join(unknown)}' if unknown else '')
+                )
+
+    def run(self):
+        """返回 {表名: 复制行数}"""
+        started = time.monotonic()
+        self.check_migrations()
+        models = self.models()
+        counts = {}
+        with transaction.atomic(using=self.target), ExitStack() as stack:
+            for model in models:
+                stack.enter_context(keep_timestamps(model))
+                counts[model._meta.db_table] = self.copy(model)
+            permissions = self.permission_map()
+            for through in self.through_models():
+                counts[through._meta.db_table] = self.copy_through(through, permissions)
+            self.reset_sequences(models + self.through_models())
+        return {'tables': counts, 'elapsed': round(time.monotonic() - started, 3)}
+
+    def permission_map(self):
+        """
+        源库权限ID -> 目标库权限ID。
+
+        权限由各库 migrate 时自动生成，ID 不一定相同，按 (应用, 模型, 权限代码) 对应。
+        """
+        def natural_keys(alias):
+            return Permission.objects.using(alias).values_list(
+                'content_type__app_label', 'content_type__model', 'codename', 'id')
+
+        target = {(app, model, codename): pk for app, model, codename, pk in natural_keys(self.target)}
+        return {pk: target.get((app, model, codename)) for app, model, codename, pk in natural_keys(self.source)}
+
+    def copy_through(self, through, permissions):
+        """复制多对多中间表，指向权限的外键换成目标库中的权限ID，目标库没有的权限跳过"""
+        fks = [field for field in through._meta.concrete_fields if field.is_relation]
+        rows = through._default_manager.using(self.source).order_by('pk') \
+            .values_list('pk', *(field.attname for field in fks))
+        copied = []
+        for pk, *values in rows.iterator(chunk_size=self.batch_size):
+            row = {}
+            for field, value in zip(fks, values):
+                if field.related_model is Permission:
+                    value = permissions.get(value)
+                row[field.attname] = value
+            if None not in row.values():
+                copied.append(through(pk=pk, **row))
+        through._default_manager.using(self.target).bulk_create(copied, batch_size=self.batch_size)
+        return len(copied)
+
+    def copy(self, model):
+        rows = model._default_manager.using(self.source).order_by('pk').iterator(chunk_size=self.batch_size)
+        target = model._default_manager.using(self.target)
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                target.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            target.bulk_create(batch)
+            count += len(batch)
+        return count
+
+    def reset_sequences(self, models):
+        connection = connections[self.target]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
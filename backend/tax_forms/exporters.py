@@ -0,0 +1,142 @@
+import csv
+import tempfile
+from itertools import islice
+
+from django.db import models
+
+from .models import TaxForm, RiskAlert, SECTIONS
+
+# 风险提醒是一对多，同一表单的多条提醒合并到一个单元格中，逐行排列
+RISK_ALERT_PATH = 'daily_management.risk_alerts'
+RISK_ALERT_FIELDS = ['document', 'delivery_date']
+
+FORM_FIELDS = ['id', 'month', 'taxpayer_name', 'credit_code', 'taxpayer_status',
+               'industry', 'tax_authority_code', 'tax_authority_name']
+
+# 按 demand.md 表单内容字典的顺序导出各部分（见 FormSection）
+EXPORT_SECTIONS = [
+    'tax_info',
+    'daily_management',
+    RISK_ALERT_PATH,
+    'daily_management.interview',
+    'daily_management.tax_payment_plan',
+    'daily_management.taxpayer_report',
+    'daily_management.taxpayer_assets',
+    'tax_payment_with_assets',
+    'collection',
+]
+
+
+def format_value(field, value):
+    if value is None:
+        return ''
+    if isinstance(field, models.BooleanField):
+        return '是' if value else '否'
+    if isinstance(field, models.DateField) and not isinstance(field, models.DateTimeField):
+        # demand.md 中日期为 YYYY/M/D 格式，如 2025/2/15
+        return f'{value.year}/{value.month}/{value.day}'
+    return str(value)
+
+
+class LedgerExporter:
+    """
+    将台账展开为一行一张表单导出，表头为各字段的中文 verbose_name。
+
+    数据按 chunk_size 分批从数据库游标读取（PostgreSQL 下为服务端游标），
+    每批只额外查询一次风险提醒，因此内存占用与导出的总行数无关。
+    """
+    chunk_size = 2000
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        # (表单列名或风险提醒字段名, 模型字段, 表头, 所属可选部分的已填写标记)
+        self.columns = []
+        for name in FORM_FIELDS:
+            field = TaxForm._meta.get_field(name)
+            self.columns.append((name, field, str(field.verbose_name), None))
+        for path in EXPORT_SECTIONS:
+            if path == RISK_ALERT_PATH:
+                for name in RISK_ALERT_FIELDS:
+                    field = RiskAlert._meta.get_field(name)
+                    self.columns.append((name, field, f'{RiskAlert._meta.verbose_name}-{field.verbose_name}',
+                                         RISK_ALERT_PATH))
+                continue
+            section = SECTIONS[path]
+            for column in section.columns:
+                field = TaxForm._meta.get_field(column)
+                self.columns.append((column, field, f'{section.verbose_name}-{field.verbose_name}',
+                                     section.presence_field))
+        self.presence_fields = list(dict.fromkeys(
+            presence for _, _, _, presence in self.columns if presence and presence != RISK_ALERT_PATH))
+
+    @property
+    def headers(self):
+        return [header for _, _, header, _ in self.columns]
+
+    def value_paths(self):
+        return [column for column, _, _, presence in self.columns if presence != RISK_ALERT_PATH]
+
+    def rows(self):
+        """逐行生成已格式化的单元格列表（不含表头）"""
+        paths = ['pk'] + self.presence_fields + self.value_paths()
+        iterator = self.queryset.values_list(*paths).iterator(chunk_size=self.chunk_size)
+        skip = 1 + len(self.presence_fields)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            alerts = self.risk_alerts({row[0] for row in chunk})
+            for row in chunk:
+                present = dict(zip(self.presence_fields, row[1:skip]))
+                yield self.format_row(row[skip:], alerts.get(row[0], []), present)
+
+    def risk_alerts(self, form_ids):
+        alerts = {}
+        queryset = RiskAlert.objects.filter(tax_form_id__in=form_ids) \
+            .order_by('tax_form_id', 'id') \
+            .values_list('tax_form_id', *RISK_ALERT_FIELDS)
+        for form_id, *values in queryset:
+            alerts.setdefault(form_id, []).append(values)
+        return alerts
+
+    def format_row(self, values, alerts, present):
+        values = iter(values)
+        cells = []
+        for name, field, _, presence in self.columns:
+            if presence == RISK_ALERT_PATH:
+                index = RISK_ALERT_FIELDS.index(name)
+                cells.append('\n'.join(format_value(field, alert[index]) for alert in alerts))
+                continue
+            value = next(values)
+            # 未填写的可选部分留空
+            cells.append(format_value(field, value) if presence is None or present[presence] else '')
+        return cells
+
+    def iter_csv(self):
+        """逐行生成 CSV 文本，带 BOM 以便 Excel 正确识别 UTF-8"""
+        buffer = EchoBuffer()
+        writer = csv.writer(buffer)
+        yield '\ufeff' + writer.writerow(self.headers)
+        for row in self.rows():
+            yield writer.writerow(row)
+
+    def write_xlsx(self):
+        """以 openpyxl 只写模式生成 XLSX，返回已定位到开头的临时文件"""
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet('台账')
+        sheet.append(self.headers)
+        for row in self.rows():
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return output
+
+
+class EchoBuffer:
+    """csv.writer 写入时直接返回内容，用于流式响应"""
+
+    def write(self, value):
+        return value
@@ -0,0 +1,55 @@
+import django_filters
+from rest_framework.filters import OrderingFilter
+
+from .models import TaxForm
+
+
+class TaxFormFilter(django_filters.FilterSet):
+    """税务表单列表过滤条件，每个条件都有对应的索引支撑"""
+    month = django_filters.CharFilter(field_name='month')
+    tax_authority_code = django_filters.CharFilter(field_name='tax_authority_code')
+    taxpayer_status = django_filters.ChoiceFilter(field_name='taxpayer_status',
+                                                  choices=TaxForm.TAXPAYER_STATUS_CHOICES)
+    status = django_filters.ChoiceFilter(field_name='status', choices=TaxForm.STATUS_CHOICES)
+    invoice_control = django_filters.ChoiceFilter(field_name='daily_management_invoice_control',
+                                                  choices=TaxForm.INVOICE_CONTROL_CHOICES)
+    outstanding_tax_min = django_filters.NumberFilter(field_name='tax_info_outstanding_tax',
+                                                      lookup_expr='gte')
+    outstanding_tax_max = django_filters.NumberFilter(field_name='tax_info_outstanding_tax',
+                                                      lookup_expr='lte')
+
+    class Meta:
+        model = TaxForm
+        fields = ['month', 'tax_authority_code', 'taxpayer_status', 'status',
+                  'invoice_control', 'outstanding_tax_min', 'outstanding_tax_max']
+
+
+class TaxFormOrderingFilter(OrderingFilter):
+    """
+    税务表单排序，如 ?ordering=-outstanding_tax,id
+
+    键集分页（带 cursor/page_size 参数）始终按 (month, id) 排序，此时排序参数不生效。
+    """
+    # 排序参数名 -> ORM 字段路径
+    ordering_fields_map = {
+        'id': 'id',
+        'month': 'month',
+        'taxpayer_name': 'taxpayer_name',
+        'credit_code': 'credit_code',
+        'taxpayer_status': 'taxpayer_status',
+        'tax_authority_code': 'tax_authority_code',
+        'status': 'status',
+        'updated_at': 'updated_at',
+        'outstanding_tax': 'tax_info_outstanding_tax',
+        'invoice_control': 'daily_management_invoice_control',
+    }
+
+    def get_valid_fields(self, queryset, view, context={}):
+        return [(name, name) for name in self.ordering_fields_map]
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        ordering = []
+        for term in super().remove_invalid_fields(queryset, fields, view, request):
+            prefix = '-' if term.startswith('-') else ''
+            ordering.append(prefix + self.ordering_fields_map[term.lstrip('-')])
+        return ordering
@@ -0,0 +1,53 @@
+from django.core.cache import caches, InvalidCacheBackendError
+
+# settings.CACHES 中的缓存别名，未配置时不使用缓存
+CACHE_ALIAS = 'tax_forms'
+
+
+def get_form_cache():
+    """未配置缓存时返回不做缓存的实例，每次都重新序列化"""
+    try:
+        return SerializedFormCache(caches[CACHE_ALIAS])
+    except InvalidCacheBackendError:
+        return SerializedFormCache(None)
+
+
+class SerializedFormCache:
+    """
+    按 (表单ID, 版本号) 缓存单张表单序列化后的数据。
+
+    表单或其风险提醒的每次写入都会递增版本号，旧版本的缓存项不会再被读取，
+    无需主动失效，由缓存后端按 MAX_ENTRIES 淘汰（LocMemCache 淘汰最久未访问的条目）。
+    序列化器输出格式变化时，应递增 CACHES 配置中的 VERSION。
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def key(pk, version):
+        return f'{pk}:{version}'
+
+    def render(self, forms, serialize):
+        """
+        按 forms 的顺序返回序列化数据。
+
+        forms 只需加载 id 和 version；未命中缓存的表单通过 serialize(ids) 批量序列化，
+        serialize 返回的列表顺序不限，结果写回缓存。
+        """
+        keys = [self.key(form.pk, form.version) for form in forms]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = [form.pk for form, key in zip(forms, keys) if key not in cached]
+        if missing:
+            fresh = {self.key(data['id'], data['version']): data for data in serialize(missing)}
+            if self.cache is not None:
+                self.cache.set_many(fresh)
+            cached.update(fresh)
+        # 两次查询之间表单可能被修改或删除：修改的按新版本返回，删除的不再返回
+        by_id = {data['id']: data for data in cached.values()}
+        results = []
+        for form, key in zip(forms, keys):
+            data = cached.get(key) or by_id.get(form.pk)
+            if data is not None:
+                results.append(data)
+        return results
@@ -0,0 +1,208 @@
+import codecs
+import csv
+import datetime
+import os
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import TaxForm, FORM_SECTIONS, SECTIONS
+from .serializers import TaxFormSerializer
+from .summary import refresh_months_on_commit
+
+
+class RosterImportError(Exception):
+    """名单文件无法读取（格式不支持、缺少表头等）"""
+
+
+# 导入名单时可填写的部分（见 FormSection），只导入其中由管理员填写的字段
+ROSTER_SECTIONS = ['tax_info', 'daily_management', 'collection']
+
+
+def build_column_map():
+    """表头 -> (嵌套路径, 字段名)，表头可以是字段名或中文 verbose_name"""
+    columns = {}
+    for name in TaxForm.admin_only_fields:
+        field = TaxForm._meta.get_field(name)
+        columns[name] = ((), name)
+        columns[str(field.verbose_name)] = ((), name)
+    for path in ROSTER_SECTIONS:
+        section = SECTIONS[path]
+        for name in section.admin_only_fields:
+            field = TaxForm._meta.get_field(section.column(name))
+            columns[name] = ((path,), name)
+            columns[str(field.verbose_name)] = ((path,), name)
+    return columns
+
+
+def iter_csv_rows(file, encoding='utf-8-sig'):
+    """逐行读取 CSV，file 为二进制文件对象"""
+    yield from csv.reader(codecs.iterdecode(file, encoding))
+
+
+def iter_xlsx_rows(file):
+    """以只读模式逐行读取 XLSX 的第一个工作表"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise RosterImportError('导入 XLSX 需要安装 openpyxl')
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename, encoding='utf-8-sig'):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        return iter_csv_rows(file, encoding)
+    if ext in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(file)
+    raise RosterImportError(f'不支持的文件格式: {ext or filename}')
+
+
+def clean_cell(value):
+    """将单元格的值转换为序列化器可接受的字符串，空单元格返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float):
+        # Excel 中的整数列（如月度、机关代码）会读成浮点数
+        return str(int(value)) if value.is_integer() else str(Decimal(repr(value)))
+    value = str(value).strip()
+    return value or None
+
+
+class RosterImporter:
+    """
+    流式导入每月的纳税人名单。
+
+    逐行读取文件，每 chunk_size 行校验一次并在一个事务内批量写入 TaxForm。同一月度中已存在的统一社会信用代码会被跳过。
+    """
+    chunk_size = 500
+    # 每条 INSERT 写入的行数，数据库对单条语句的参数个数限制更小时按数据库的上限拆分
+    batch_size = 100
+
+    def __init__(self, month=None, chunk_size=None, batch_size=None):
+        self.month = month
+        if chunk_size:
+            self.chunk_size = chunk_size
+        if batch_size:
+            self.batch_size = batch_size
+        self.columns = build_column_map()
+        # 复用同一个序列化器实例做校验，避免每行重新构建嵌套字段
+        self.validator = TaxFormSerializer()
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def run(self, rows):
+        started = time.monotonic()
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            raise RosterImportError('文件为空')
+        mapping = self.map_header(header)
+
+        chunk = []
+        # 第 1 行为表头，数据从第 2 行开始
+        for line_no, row in enumerate(rows, start=2):
+            payload = self.build_payload(mapping, row)
+            if payload is None:
+                continue
+            chunk.append((line_no, payload))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'elapsed': round(time.monotonic() - started, 3),
+        }
+
+    def map_header(self, header):
+        mapping = []
+        for index, title in enumerate(header):
+            column = self.columns.get(clean_cell(title))
+            if column:
+                mapping.append((index, column))
+        if not any(column == ((), 'taxpayer_name') for _, column in mapping):
+            raise RosterImportError('缺少“纳税人名称”列')
+        return mapping
+
+    def build_payload(self, mapping, row):
+        payload = {
+            'tax_info': {},
+            'daily_management': {},
+            'collection': {},
+            'tax_payment_with_assets': {},
+        }
+        empty = True
+        for index, (path, name) in mapping:
+            value = clean_cell(row[index]) if index < len(row) else None
+            if value is None:
+                continue
+            empty = False
+            target = payload
+            for key in path:
+                target = target[key]
+            target[name] = value
+        if empty:
+            return None
+        if self.month:
+            payload['month'] = self.month
+        return payload
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line_no, payload in chunk:
+            try:
+                valid.append(self.validator.run_validation(payload))
+            except serializers.ValidationError as exc:
+                self.errors.append({'row': line_no, 'errors': exc.detail})
+
+        with transaction.atomic():
+            valid = self.exclude_existing(valid)
+            self.write(valid)
+        self.created += len(valid)
+
+    def exclude_existing(self, rows):
+        """跳过本月已导入的信用代码（含本批次内的重复行）"""
+        default_month = TaxForm._meta.get_field('month').get_default()
+        keys = {(row.get('month', default_month), row.get('credit_code')) for row in rows
+                if row.get('credit_code')}
+        existing = set(
+            TaxForm.objects.filter(
+                month__in={month for month, _ in keys},
+                credit_code__in={code for _, code in keys},
+            ).values_list('month', 'credit_code')
+        )
+        result = []
+        for row in rows:
+            key = (row.get('month', default_month), row.get('credit_code'))
+            if key[1] and key in existing:
+                self.skipped += 1
+                continue
+            existing.add(key)
+            result.append(row)
+        return result
+
+    def write(self, rows):
+        """校验后的数据已展开为表单的列，每 batch_size 行一条 INSERT 写入，可选的各部分按默认值标记为已填写"""
+        presence = {section.presence_field: True for section in FORM_SECTIONS if section.presence_field}
+        forms = [
+            TaxForm(**{k: v for k, v in row.items() if k != 'risk_alerts'}, **presence)
+            for row in rows
+        ]
+        TaxForm.objects.bulk_create(forms, batch_size=self.batch_size)
+        refresh_months_on_commit({form.month for form in forms})
@@ -0,0 +1,166 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .permissions import IsAdminUserType
+
+# 当前请求的计时数据，未启用计时或不在请求中时为 None
+_current = contextvars.ContextVar('request_timings', default=None)
+
+# 直方图的桶上限（毫秒），最后一个桶收集超过上限的请求
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class RequestTimings:
+    """单个请求的 SQL 次数和各阶段耗时（秒）"""
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - started
+
+
+@contextmanager
+def measure(name):
+    """在启用计时的请求中累计代码块耗时，如 with measure('serialize'): ..."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] = timings.durations.get(name, 0.0) + time.perf_counter() - started
+
+
+class TimingHistogram:
+    """进程内按视图汇总的请求耗时直方图"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, key, total, timings):
+        with self.lock:
+            stats = self.views.get(key)
+            if stats is None:
+                stats = self.views[key] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'queries': 0, 'max_queries': 0,
+                    'durations_ms': {},
+                    'buckets': [0] * (len(BUCKETS_MS) + 1),
+                }
+            total_ms = total * 1000
+            stats['count'] += 1
+            stats['total_ms'] += total_ms
+            stats['max_ms'] = max(stats['max_ms'], total_ms)
+            stats['queries'] += timings.queries
+            stats['max_queries'] = max(stats['max_queries'], timings.queries)
+            for name, duration in timings.durations.items():
+                stats['durations_ms'][name] = stats['durations_ms'].get(name, 0.0) + duration * 1000
+            stats['buckets'][bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+
+    def snapshot(self):
+        with self.lock:
+            result = {}
+            for key, stats in sorted(self.views.items()):
+                count = stats['count']
+                result[key] = {
+                    'count': count,
+                    'mean_ms': round(stats['total_ms'] / count, 2),
+                    'max_ms': round(stats['max_ms'], 2),
+                    'mean_queries': round(stats['queries'] / count, 2),
+                    'max_queries': stats['max_queries'],
+                    'mean_durations_ms': {name: round(value / count, 2)
+                                          for name, value in stats['durations_ms'].items()},
+                    'histogram': {
+                        **{f'<={bound}ms': n for bound, n in zip(BUCKETS_MS, stats['buckets'])},
+                        f'>{BUCKETS_MS[-1]}ms': stats['buckets'][-1],
+                    },
+                }
+            return result
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+histogram = TimingHistogram()
+
+
+class RequestTimingMiddleware:
+    """
+    记录每个请求的 SQL 次数、数据库耗时、序列化耗时和渲染耗时。
+
+    结果写入 Server-Timing 响应头（浏览器开发者工具可直接查看），并按视图汇总到进程内直方图。
+    需在 settings 中设置 REQUEST_TIMING = True 才会启用，否则该中间件不参与请求处理。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.execute_wrapper))
+                request._timing_render_started = None
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        finished = time.perf_counter()
+        if request._timing_render_started is not None:
+            timings.durations['render'] = finished - request._timing_render_started
+
+        total = finished - started
+        response['Server-Timing'] = self.server_timing(total, timings)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            histogram.record(f'{request.method} {match.view_name}', total, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF 的 Response 在所有 process_template_response 之后才渲染
+        request._timing_render_started = time.perf_counter()
+        return response
+
+    @staticmethod
+    def server_timing(total, timings):
+        metrics = [f'db;dur={timings.durations["db"] * 1000:.1f};desc="{timings.queries} queries"']
+        metrics += [f'{name};dur={duration * 1000:.1f}' for name, duration in timings.durations.items()
+                    if name != 'db']
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+class TimingStatsView(APIView):
+    """查看（GET）或清空（DELETE）本进程的请求耗时直方图，仅管理员可用"""
+    permission_classes = [IsAdminUserType]
+
+    def get(self, request):
+        return Response({'enabled': getattr(settings, 'REQUEST_TIMING', False), 'views': histogram.snapshot()})
+
+    def delete(self, request):
+        histogram.reset()
+        return Response(status=204)
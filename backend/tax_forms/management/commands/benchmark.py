@@ -0,0 +1,50 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from tax_forms.benchmark import ApiBenchmark
+from tax_forms.synthetic import LedgerGenerator
+
+
+class Command(BaseCommand):
+    help = '在临时测试数据库中生成台账并对主要 API 做基准测试，结果写入 JSON 文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1000, help='首月欠税企业数，默认 1000')
+        parser.add_argument('--months', type=int, default=3, help='月数，默认 3')
+        parser.add_argument('--iterations', type=int, default=20, help='每个场景的请求次数，默认 20')
+        parser.add_argument('--page-size', type=int, default=100, help='分页场景的页大小，默认 100')
+        parser.add_argument('--bulk-size', type=int, default=100, help='批量导入场景每次导入的行数，默认 100')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子，默认 0')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='只运行指定场景，可重复指定')
+        parser.add_argument('--output', default='benchmark.json', help='结果文件，默认 benchmark.json')
+
+    def handle(self, *args, **options):
+        # 在独立的测试数据库中运行，不影响正式数据
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            result = LedgerGenerator(options['companies'], options['months'], seed=options['seed']).run()
+            self.stdout.write(f"生成 {result['created']} 张表单，结转 {result['carried']} 张，"
+                              f"耗时 {result['elapsed']} 秒")
+            admin = get_user_model().objects.create_user(username='benchmark', user_type='admin')
+            report = ApiBenchmark(admin, iterations=options['iterations'], page_size=options['page_size'],
+                                  bulk_size=options['bulk_size'], seed=options['seed']).run(options['scenarios'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report['meta']['dataset'] = {'companies': options['companies'], 'months': options['months'],
+                                     'seed': options['seed']}
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(f"{name:<16} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                              f"SQL {stats['queries_mean']:>6.1f}  内存峰值 {stats['peak_memory_kb']:>9.1f} KB")
+        self.stdout.write(self.style.SUCCESS(f"结果已写入 {options['output']}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tax_forms.carry_forward import CarryForward
+
+
+class Command(BaseCommand):
+    help = '将上月欠税余额大于 0 的表单结转到指定月度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', default=timezone.now().strftime('%Y%m'),
+                            help='结转到的月度，如 202504，默认当前月')
+        parser.add_argument('--source-month', help='来源月度，默认为上一个月')
+
+    def handle(self, *args, **options):
+        try:
+            result = CarryForward(options['month'], options['source_month']).run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"从 {result['source_month']} 结转 {result['forms']} 张表单到 {result['month']}，"
+            f"耗时 {result['elapsed']} 秒"
+        ))
+        for table, count in result['copied'].items():
+            self.stdout.write(f'  {table}: {count}')
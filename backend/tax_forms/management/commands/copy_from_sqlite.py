@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from tax_forms.database_copy import DatabaseCopier, DatabaseCopyError, register_sqlite, unregister
+
+SOURCE_ALIAS = 'sqlite_source'
+
+
+class Command(BaseCommand):
+    help = '把现有 SQLite 数据库中的用户和台账复制到当前配置的数据库（如 PostgreSQL），保留原有 ID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='SQLite 数据库文件，如 db.sqlite3')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='目标数据库别名，默认 default')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批复制的行数，默认 2000')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'找不到 SQLite 数据库文件: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('每批行数必须大于 0')
+
+        register_sqlite(SOURCE_ALIAS, path.resolve())
+        try:
+            copier = DatabaseCopier(SOURCE_ALIAS, options['database'], batch_size=options['batch_size'])
+            try:
+                copier.check_migrations()
+            except DatabaseCopyError as exc:
+                raise CommandError(str(exc))
+            non_empty = copier.non_empty_tables()
+            if non_empty:
+                raise CommandError(f'目标数据库中以下表已有数据，请先清空: {", ".join(non_empty)}')
+            result = copier.run()
+        finally:
+            unregister(SOURCE_ALIAS)
+
+        for table, count in result['tables'].items():
+            self.stdout.write(f'{table:<40} {count:>10} 行')
+        self.stdout.write(self.style.SUCCESS(
+            f"共复制 {sum(result['tables'].values())} 行，耗时 {result['elapsed']} 秒"
+        ))
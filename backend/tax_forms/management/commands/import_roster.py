@@ -0,0 +1,36 @@
+import codecs
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tax_forms.importers import RosterImporter, RosterImportError, iter_rows
+
+
+class Command(BaseCommand):
+    help = '从 CSV/XLSX 文件批量导入每月的纳税人名单'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='名单文件路径（.csv 或 .xlsx）')
+        parser.add_argument('--month', help='覆盖文件中的月度，如 202503')
+        parser.add_argument('--chunk-size', type=int, default=RosterImporter.chunk_size,
+                            help='每个事务写入的行数')
+        parser.add_argument('--encoding', default='utf-8-sig', help='CSV 文件编码，如 gbk')
+
+    def handle(self, *args, **options):
+        try:
+            codecs.lookup(options['encoding'])
+        except LookupError:
+            raise CommandError(f"不支持的编码: {options['encoding']}")
+
+        importer = RosterImporter(month=options['month'], chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.run(iter_rows(file, options['path'], options['encoding']))
+        except (OSError, RosterImportError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result['errors']:
+            self.stderr.write(f"第 {error['row']} 行: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"导入 {result['created']} 行，跳过 {result['skipped']} 行，"
+            f"错误 {len(result['errors'])} 行，耗时 {result['elapsed']} 秒"
+        ))
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['month', 'id'], name='tax_form_month_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0002_taxform_month_id_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['month', 'tax_authority_code'], name='tax_form_month_authority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['month', 'taxpayer_status'], name='tax_form_month_tp_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['month', 'status'], name='tax_form_month_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['tax_authority_code', 'month'], name='tax_form_authority_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxinfo',
+            index=models.Index(fields=['outstanding_tax', 'tax_form'], name='tax_info_outstanding_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymanagement',
+            index=models.Index(fields=['invoice_control', 'tax_form'], name='daily_mgmt_invoice_idx'),
+        ),
+    ]
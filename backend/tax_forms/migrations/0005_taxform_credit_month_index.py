@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0004_taxform_carried_from'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['credit_code', 'month'], name='tax_form_credit_month_idx'),
+        ),
+    ]
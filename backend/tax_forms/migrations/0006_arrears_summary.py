@@ -0,0 +1,66 @@
+from django.db import migrations, models
+
+
+def build_summary(apps, schema_editor):
+    """为已有台账生成汇总"""
+    from django.db.models import Count, F, Sum
+
+    db = schema_editor.connection.alias
+    TaxForm = apps.get_model('tax_forms', 'TaxForm')
+    ArrearsSummary = apps.get_model('tax_forms', 'ArrearsSummary')
+    groups = (
+        TaxForm.objects.using(db)
+        .values('month', 'tax_authority_name', 'taxpayer_status',
+                invoice_control_value=F('daily_management__invoice_control'))
+        .annotate(
+            form_count=Count('id'),
+            outstanding_tax_sum=Sum('tax_info__outstanding_tax'),
+            collection_effect_sum=Sum('tax_info__collection_effect'),
+        )
+        .order_by()
+    )
+    ArrearsSummary.objects.using(db).bulk_create(
+        ArrearsSummary(
+            month=group['month'],
+            tax_authority_name=group['tax_authority_name'],
+            taxpayer_status=group['taxpayer_status'],
+            invoice_control=group['invoice_control_value'],
+            form_count=group['form_count'],
+            outstanding_tax=group['outstanding_tax_sum'] or 0,
+            collection_effect=group['collection_effect_sum'] or 0,
+        )
+        for group in groups
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0005_taxform_credit_month_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArrearsSummary',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('month', models.CharField(blank=True, max_length=6, null=True, verbose_name='月度')),
+                ('tax_authority_name', models.CharField(blank=True, max_length=255, null=True, verbose_name='主管税务所名称')),
+                ('taxpayer_status', models.CharField(blank=True, max_length=20, null=True, verbose_name='纳税人状态')),
+                ('invoice_control', models.CharField(blank=True, max_length=20, null=True, verbose_name='发票管控')),
+                ('form_count', models.IntegerField(default=0, verbose_name='表单数')),
+                ('outstanding_tax', models.DecimalField(decimal_places=2, default=0.0, max_digits=16, verbose_name='欠缴税费合计')),
+                ('collection_effect', models.DecimalField(decimal_places=2, default=0.0, max_digits=16, verbose_name='清欠成效合计')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='刷新时间')),
+            ],
+            options={
+                'verbose_name': '月度欠税汇总',
+                'verbose_name_plural': '月度欠税汇总',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='arrearssummary',
+            index=models.Index(fields=['month', 'tax_authority_name'], name='arrears_summary_month_idx'),
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
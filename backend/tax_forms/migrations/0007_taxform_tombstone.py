@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0006_arrears_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxFormTombstone',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('form_id', models.IntegerField(verbose_name='已删除的表单序号')),
+                ('month', models.CharField(blank=True, max_length=6, null=True, verbose_name='月度')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='删除时间')),
+            ],
+            options={
+                'verbose_name': '已删除表单',
+                'verbose_name_plural': '已删除表单',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['updated_at', 'id'], name='tax_form_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxformtombstone',
+            index=models.Index(fields=['deleted_at'], name='tax_form_tombstone_at_idx'),
+        ),
+    ]
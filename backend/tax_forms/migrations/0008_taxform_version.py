@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_forms', '0007_taxform_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxform',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='版本号'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tax_forms', '0008_taxform_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxFormAssignment',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('month', models.CharField(blank=True, max_length=6, null=True, verbose_name='月度')),
+                ('assigned_at', models.DateTimeField(auto_now=True, verbose_name='分配时间')),
+                ('assigned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='分配人')),
+                ('assignee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_form_assignments', to=settings.AUTH_USER_MODEL, verbose_name='负责人')),
+                ('tax_form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='assignment', to='tax_forms.taxform', verbose_name='关联的税务表单')),
+            ],
+            options={
+                'verbose_name': '表单分配',
+                'verbose_name_plural': '表单分配',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorityAssignment',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tax_authority_code', models.CharField(max_length=11, verbose_name='主管税务机关代码')),
+                ('assigned_at', models.DateTimeField(auto_now=True, verbose_name='分配时间')),
+                ('assigned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='分配人')),
+                ('assignee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='authority_assignments', to=settings.AUTH_USER_MODEL, verbose_name='负责人')),
+            ],
+            options={
+                'verbose_name': '税务机关分配',
+                'verbose_name_plural': '税务机关分配',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='taxformassignment',
+            index=models.Index(fields=['assignee', 'month', 'tax_form'], name='assignment_assignee_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='authorityassignment',
+            constraint=models.UniqueConstraint(fields=['assignee', 'tax_authority_code'], name='authority_assignment_unique'),
+        ),
+    ]
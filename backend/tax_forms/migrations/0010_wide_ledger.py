@@ -0,0 +1,278 @@
+from django.core.management.color import no_style
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 原一对一子表 -> (到表单 id 的路径, 合并后的列名前缀, 字段, 已填写标记)
+LEGACY_SECTIONS = [
+    ('TaxInfo', 'tax_form_id', 'tax_info', ['outstanding_tax', 'tax_types', 'collection_effect'], None),
+    ('DailyManagement', 'tax_form_id', 'daily_management', ['reminders', 'invoice_control'], None),
+    ('Interview', 'daily_management__tax_form_id', 'interview',
+     ['has_interview', 'document', 'interview_date'], 'interview_present'),
+    ('TaxPaymentPlan', 'daily_management__tax_form_id', 'tax_payment_plan',
+     ['has_agreement', 'month_count', 'current_execution', 'unfulfilled_reason'], 'tax_payment_plan_present'),
+    ('TaxpayerReport', 'daily_management__tax_form_id', 'taxpayer_report',
+     ['periodic_report', 'asset_disposal_report', 'merger_division_report'], 'taxpayer_report_present'),
+    ('TaxpayerAssets', 'daily_management__tax_form_id', 'taxpayer_assets',
+     ['bank_accounts', 'real_estate', 'vehicles', 'other_assets'], 'taxpayer_assets_present'),
+    ('Collection', 'tax_form_id', 'collection',
+     ['guarantees', 'freezing', 'seizures', 'reminders', 'forced_collection', 'auction',
+      'court_execution', 'rights_exercise', 'exit_prevention', 'prohibited_departure'], None),
+    ('TaxPaymentWithAssets', 'tax_form_id', 'tax_payment_with_assets', ['description'], None),
+]
+
+BATCH_SIZE = 500
+
+
+def merge_sections(apps, schema_editor):
+    """把各子表的值复制到表单的新列，风险提醒改为直接关联表单"""
+    from django.db.models import Exists, OuterRef, Subquery
+
+    db = schema_editor.connection.alias
+    TaxForm = apps.get_model('tax_forms', 'TaxForm')
+    for model_name, form_path, prefix, fields, presence_field in LEGACY_SECTIONS:
+        model = apps.get_model('tax_forms', model_name)
+        rows = model.objects.using(db).filter(**{form_path: OuterRef('pk')})
+        values = {f'{prefix}_{name}': Subquery(rows.values(name)[:1]) for name in fields}
+        if presence_field:
+            values[presence_field] = True
+        TaxForm.objects.using(db).filter(Exists(rows)).update(**values)
+
+    DailyManagement = apps.get_model('tax_forms', 'DailyManagement')
+    RiskAlert = apps.get_model('tax_forms', 'RiskAlert')
+    RiskAlert.objects.using(db).update(tax_form=Subquery(
+        DailyManagement.objects.using(db).filter(pk=OuterRef('daily_management_id')).values('tax_form_id')[:1]))
+
+
+def split_sections(apps, schema_editor):
+    """回滚：按表单的列重新生成子表，日常管理的主键与表单相同"""
+    db = schema_editor.connection.alias
+    TaxForm = apps.get_model('tax_forms', 'TaxForm')
+    for model_name, form_path, prefix, fields, presence_field in LEGACY_SECTIONS:
+        model = apps.get_model('tax_forms', model_name)
+        forms = TaxForm.objects.using(db).order_by('pk')
+        if presence_field:
+            forms = forms.filter(**{presence_field: True})
+        columns = [f'{prefix}_{name}' for name in fields]
+        parent = {'id': 'pk'} if model_name == 'DailyManagement' else {}
+        parent[form_path.replace('__tax_form_id', '_id')] = 'pk'
+        batch = []
+        for row in forms.values('pk', *columns).iterator(chunk_size=BATCH_SIZE):
+            batch.append(model(**{attr: row[key] for attr, key in parent.items()},
+                               **{name: row[column] for name, column in zip(fields, columns)}))
+            if len(batch) == BATCH_SIZE:
+                model.objects.using(db).bulk_create(batch)
+                batch = []
+        model.objects.using(db).bulk_create(batch)
+
+    RiskAlert = apps.get_model('tax_forms', 'RiskAlert')
+    RiskAlert.objects.using(db).update(daily_management_id=models.F('tax_form_id'))
+
+    DailyManagement = apps.get_model('tax_forms', 'DailyManagement')
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [DailyManagement]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """
+    把原一对一子表合并到表单本身（第一步）：新增列并复制数据，风险提醒改为关联表单。
+
+    旧表在 0011 中删除，两步均可回滚。
+    """
+
+    dependencies = [
+        ('tax_forms', '0009_assignments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_info_outstanding_tax',
+            field=models.DecimalField(blank=True, decimal_places=2, default=0.0, max_digits=12, null=True, verbose_name='截至目前欠缴税费情况'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_info_tax_types',
+            field=models.TextField(blank=True, null=True, verbose_name='涉及税费种'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_info_collection_effect',
+            field=models.DecimalField(blank=True, decimal_places=2, default=0.0, max_digits=12, null=True, verbose_name='清欠成效'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='daily_management_reminders',
+            field=models.TextField(blank=True, null=True, verbose_name='催缴提醒文书'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='daily_management_invoice_control',
+            field=models.CharField(blank=True, choices=[('未控票', '未控票'), ('控票中', '控票中'), ('数电票已限额', '数电票已限额'), ('拟列入', '拟列入'), ('限量供应', '限量供应'), ('停止控票', '停止控票'), ('暂停控票', '暂停控票')], default='未控票', max_length=20, null=True, verbose_name='发票管控'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='interview_present',
+            field=models.BooleanField(default=False, verbose_name='已填写约谈警示'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='interview_has_interview',
+            field=models.BooleanField(blank=True, choices=[(True, '是'), (False, '否')], default=False, null=True, verbose_name='是否约谈'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='interview_document',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='约谈文书或填写未约谈原因'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='interview_interview_date',
+            field=models.DateField(blank=True, null=True, verbose_name='约谈时间'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_plan_present',
+            field=models.BooleanField(default=False, verbose_name='已填写清缴欠税计划'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_plan_has_agreement',
+            field=models.BooleanField(blank=True, choices=[(True, '是'), (False, '否')], default=False, null=True, verbose_name='有无订立'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_plan_month_count',
+            field=models.IntegerField(blank=True, default=0, null=True, verbose_name='分期情况'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_plan_current_execution',
+            field=models.CharField(blank=True, default='0', max_length=255, null=True, verbose_name='本期执行情况'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_plan_unfulfilled_reason',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='未按期履行原因'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_report_present',
+            field=models.BooleanField(default=False, verbose_name='已填写欠税人报告事项'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_report_periodic_report',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='定期报告'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_report_asset_disposal_report',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='处置资产报告'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_report_merger_division_report',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='合并分立报告'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_assets_present',
+            field=models.BooleanField(default=False, verbose_name='已填写纳税人资产情况'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_assets_bank_accounts',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='存款账户情况'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_assets_real_estate',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='不动产信息'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_assets_vehicles',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='机动车（船舶）信息'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='taxpayer_assets_other_assets',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='其他资产信息'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_guarantees',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='纳税担保'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_freezing',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='冻结'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_seizures',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='查封、扣押'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_reminders',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='催告'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_forced_collection',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='强制扣缴（金额）'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_auction',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='拍卖、变卖（金额）'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_court_execution',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='申请人民法院强制执行'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_rights_exercise',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='行使代位权、撤销权'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_exit_prevention',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='阻止出境'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='collection_prohibited_departure',
+            field=models.CharField(blank=True, default='无', max_length=255, null=True, verbose_name='限制出境信息'),
+        ),
+        migrations.AddField(
+            model_name='taxform',
+            name='tax_payment_with_assets_description',
+            field=models.TextField(blank=True, default='无', null=True, verbose_name='抵缴欠税情况描述'),
+        ),
+        migrations.AddField(
+            model_name='riskalert',
+            name='tax_form',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='risk_alerts', to='tax_forms.taxform', verbose_name='关联的税务表单'),
+        ),
+        migrations.AlterField(
+            model_name='riskalert',
+            name='daily_management',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='risk_alerts', to='tax_forms.dailymanagement', verbose_name='关联的日常管理'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['tax_info_outstanding_tax'], name='tax_form_outstanding_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['daily_management_invoice_control'], name='tax_form_invoice_control_idx'),
+        ),
+        migrations.RunPython(merge_sections, split_sections),
+    ]
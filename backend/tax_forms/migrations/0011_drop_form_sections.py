@@ -0,0 +1,46 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """把原一对一子表合并到表单本身（第二步）：删除旧表"""
+
+    dependencies = [
+        ('tax_forms', '0010_wide_ledger'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='riskalert',
+            name='daily_management',
+        ),
+        migrations.AlterField(
+            model_name='riskalert',
+            name='tax_form',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_alerts', to='tax_forms.taxform', verbose_name='关联的税务表单'),
+        ),
+        migrations.DeleteModel(
+            name='Interview',
+        ),
+        migrations.DeleteModel(
+            name='TaxPaymentPlan',
+        ),
+        migrations.DeleteModel(
+            name='TaxpayerReport',
+        ),
+        migrations.DeleteModel(
+            name='TaxpayerAssets',
+        ),
+        migrations.DeleteModel(
+            name='DailyManagement',
+        ),
+        migrations.DeleteModel(
+            name='TaxInfo',
+        ),
+        migrations.DeleteModel(
+            name='Collection',
+        ),
+        migrations.DeleteModel(
+            name='TaxPaymentWithAssets',
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """(month, status) 类索引在只按状态过滤时无法使用，改为状态在前"""
+
+    dependencies = [
+        ('tax_forms', '0011_drop_form_sections'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='taxform',
+            name='tax_form_month_tp_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='taxform',
+            name='tax_form_month_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['taxpayer_status', 'month'], name='tax_form_tp_status_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taxform',
+            index=models.Index(fields=['status', 'month'], name='tax_form_status_month_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """删除记录保存删除前的主管税务机关和负责人，增量同步按用户可见范围返回"""
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tax_forms', '0012_status_leading_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxformtombstone',
+            name='tax_authority_code',
+            field=models.CharField(blank=True, max_length=11, null=True, verbose_name='主管税务机关代码'),
+        ),
+        migrations.AddField(
+            model_name='taxformtombstone',
+            name='assignee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                    related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='负责人'),
+        ),
+    ]
@@ -1,7 +1,38 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.expressions import Combinable
 from django.utils import timezone
 import datetime
 
+
+class TaxFormQuerySet(models.QuerySet):
+    """税务表单查询集"""
+
+    def with_related(self):
+        """加载完整的嵌套数据：各部分都在表单本身的行中，只需批量预取风险提醒"""
+        return self.prefetch_related('risk_alerts')
+
+    def touch(self):
+        """递增版本号并更新最后更新时间，用于只修改了风险提醒的表单"""
+        return self.update(version=F('version') + 1, updated_at=timezone.now())
+
+    def assigned_to(self, user, month=None):
+        """
+        分配给用户的表单，以及该用户负责的主管税务机关下的表单。
+
+        分配表按 (assignee, month) 建有索引，指定月度时只读取该用户当月的分配记录。
+        """
+        assignments = TaxFormAssignment.objects.filter(assignee=user)
+        if month:
+            assignments = assignments.filter(month=month)
+        authorities = AuthorityAssignment.objects.filter(assignee=user)
+        return self.filter(
+            Q(id__in=assignments.values('tax_form_id'))
+            | Q(tax_authority_code__in=authorities.values('tax_authority_code'))
+        )
+
+
 class TaxForm(models.Model):
     """税务表单模型"""
     TAXPAYER_STATUS_CHOICES = [
@@ -19,6 +50,25 @@ class TaxForm(models.Model):
         ('submitted', '已提交'),
         ('approved', '已审批'),
     ]
+
+    INVOICE_CONTROL_CHOICES = [
+        ('未控票', '未控票'),
+        ('控票中', '控票中'),
+        ('数电票已限额', '数电票已限额'),
+        ('拟列入', '拟列入'),
+        ('限量供应', '限量供应'),
+        ('停止控票', '停止控票'),
+        ('暂停控票', '暂停控票'),
+    ]
+
+    YES_NO_CHOICES = [
+        (True, '是'),
+        (False, '否'),
+    ]
+
+    # 参与月度欠税汇总的字段（见 summary.py）
+    summary_fields = ('month', 'tax_authority_name', 'taxpayer_status', 'tax_info_outstanding_tax',
+                      'tax_info_collection_effect', 'daily_management_invoice_control')
     
     id = models.AutoField(primary_key=True, verbose_name='序号')
     month = models.CharField(max_length=6, verbose_name='月度', 
@@ -35,12 +85,84 @@ class TaxForm(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='最后更新时间')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft', 
                              verbose_name='表单状态', null=True, blank=True)
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name='版本号')
+    carried_from = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='carried_to',
+                                     verbose_name='结转来源表单', null=True, blank=True, editable=False)
+
+    # 以下各部分原为一对一子表，合并到表单本身以免每次读写都要关联 8 张表，
+    # 列名为 <部分名>_<字段名>，API 中仍按原来的嵌套结构表示（见 FormSection）
+
+    # 欠税信息
+    tax_info_outstanding_tax = models.DecimalField(max_digits=12, decimal_places=2, default=0.00,
+                                                   verbose_name='截至目前欠缴税费情况', null=True, blank=True)
+    tax_info_tax_types = models.TextField(verbose_name='涉及税费种', null=True, blank=True)
+    tax_info_collection_effect = models.DecimalField(max_digits=12, decimal_places=2, default=0.00,
+                                                     verbose_name='清欠成效', null=True, blank=True)
+
+    # 日常管理
+    daily_management_reminders = models.TextField(verbose_name='催缴提醒文书', null=True, blank=True)
+    daily_management_invoice_control = models.CharField(max_length=20, choices=INVOICE_CONTROL_CHOICES,
+                                                        default='未控票', verbose_name='发票管控',
+                                                        null=True, blank=True)
+
+    # 约谈警示
+    interview_present = models.BooleanField(default=False, verbose_name='已填写约谈警示')
+    interview_has_interview = models.BooleanField(choices=YES_NO_CHOICES, default=False, verbose_name='是否约谈',
+                                                  null=True, blank=True)
+    interview_document = models.CharField(max_length=255, verbose_name='约谈文书或填写未约谈原因',
+                                          blank=True, null=True)
+    interview_interview_date = models.DateField(verbose_name='约谈时间', null=True, blank=True)
+
+    # 清缴欠税计划
+    tax_payment_plan_present = models.BooleanField(default=False, verbose_name='已填写清缴欠税计划')
+    tax_payment_plan_has_agreement = models.BooleanField(choices=YES_NO_CHOICES, default=False,
+                                                         verbose_name='有无订立', null=True, blank=True)
+    tax_payment_plan_month_count = models.IntegerField(default=0, verbose_name='分期情况', null=True, blank=True)
+    tax_payment_plan_current_execution = models.CharField(max_length=255, default='0', verbose_name='本期执行情况',
+                                                          null=True, blank=True)
+    tax_payment_plan_unfulfilled_reason = models.TextField(default='无', verbose_name='未按期履行原因',
+                                                           null=True, blank=True)
+
+    # 欠税人报告事项
+    taxpayer_report_present = models.BooleanField(default=False, verbose_name='已填写欠税人报告事项')
+    taxpayer_report_periodic_report = models.TextField(default='无', verbose_name='定期报告', null=True, blank=True)
+    taxpayer_report_asset_disposal_report = models.TextField(default='无', verbose_name='处置资产报告',
+                                                             null=True, blank=True)
+    taxpayer_report_merger_division_report = models.TextField(default='无', verbose_name='合并分立报告',
+                                                              null=True, blank=True)
+
+    # 纳税人资产情况
+    taxpayer_assets_present = models.BooleanField(default=False, verbose_name='已填写纳税人资产情况')
+    taxpayer_assets_bank_accounts = models.TextField(default='无', verbose_name='存款账户情况', null=True, blank=True)
+    taxpayer_assets_real_estate = models.TextField(default='无', verbose_name='不动产信息', null=True, blank=True)
+    taxpayer_assets_vehicles = models.TextField(default='无', verbose_name='机动车（船舶）信息', null=True, blank=True)
+    taxpayer_assets_other_assets = models.TextField(default='无', verbose_name='其他资产信息', null=True, blank=True)
+
+    # 欠税追征
+    collection_guarantees = models.TextField(default='无', verbose_name='纳税担保', null=True, blank=True)
+    collection_freezing = models.TextField(default='无', verbose_name='冻结', null=True, blank=True)
+    collection_seizures = models.TextField(default='无', verbose_name='查封、扣押', null=True, blank=True)
+    collection_reminders = models.TextField(default='无', verbose_name='催告', null=True, blank=True)
+    collection_forced_collection = models.TextField(default='无', verbose_name='强制扣缴（金额）', null=True, blank=True)
+    collection_auction = models.TextField(default='无', verbose_name='拍卖、变卖（金额）', null=True, blank=True)
+    collection_court_execution = models.TextField(default='无', verbose_name='申请人民法院强制执行',
+                                                  null=True, blank=True)
+    collection_rights_exercise = models.TextField(default='无', verbose_name='行使代位权、撤销权', null=True, blank=True)
+    collection_exit_prevention = models.TextField(default='无', verbose_name='阻止出境', null=True, blank=True)
+    collection_prohibited_departure = models.CharField(max_length=255, default='无', verbose_name='限制出境信息',
+                                                       null=True, blank=True)
+
+    # 抵缴欠税情况
+    tax_payment_with_assets_description = models.TextField(default='无', verbose_name='抵缴欠税情况描述',
+                                                           null=True, blank=True)
 
     # 仅管理员可编辑的字段列表
     admin_only_fields = [
         'month', 'taxpayer_name', 'credit_code', 'taxpayer_status', 
         'industry', 'tax_authority_code', 'tax_authority_name'
     ]
+
+    objects = TaxFormQuerySet.as_manager()
     
     class Meta:
         verbose_name = '税务表单'
@@ -49,68 +171,99 @@ class TaxForm(models.Model):
             models.Index(fields=['credit_code']),
             models.Index(fields=['month']),
             models.Index(fields=['taxpayer_name']),
+            # 键集分页按 (month, id) 排序和定位
+            models.Index(fields=['month', 'id'], name='tax_form_month_id_idx'),
+            # 列表过滤常与月度组合使用
+            models.Index(fields=['month', 'tax_authority_code'], name='tax_form_month_authority_idx'),
+            # 状态在前，单独按状态过滤时同样可以使用索引
+            models.Index(fields=['taxpayer_status', 'month'], name='tax_form_tp_status_month_idx'),
+            models.Index(fields=['status', 'month'], name='tax_form_status_month_idx'),
+            models.Index(fields=['tax_authority_code', 'month'], name='tax_form_authority_month_idx'),
+            # 按信用代码查找上月表单作为默认值
+            models.Index(fields=['credit_code', 'month'], name='tax_form_credit_month_idx'),
+            # 增量同步按最后更新时间查找变更
+            models.Index(fields=['updated_at', 'id'], name='tax_form_updated_at_idx'),
+            # 欠税金额区间过滤和发票管控过滤
+            models.Index(fields=['tax_info_outstanding_tax'], name='tax_form_outstanding_idx'),
+            models.Index(fields=['daily_management_invoice_control'], name='tax_form_invoice_control_idx'),
         ]
     
+    def save(self, *args, **kwargs):
+        """已有表单每次保存都在同一条 UPDATE 中递增版本号"""
+        if not self._state.adding:
+            self.version = F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'version'}
+        super().save(*args, **kwargs)
+        if isinstance(self.version, Combinable):
+            self.refresh_from_db(fields=['version'])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的月度，月度被修改时旧月度的汇总同样需要刷新
+        instance._loaded_month = dict(zip(field_names, values)).get('month')
+        return instance
+
     def __str__(self):
         return f"{self.taxpayer_name or '未命名'} - {self.month or '无月份'}"
 
 
-class TaxInfo(models.Model):
-    """欠税信息模型"""
-    id = models.AutoField(primary_key=True)
-    tax_form = models.OneToOneField(TaxForm, on_delete=models.CASCADE, related_name='tax_info', 
-                                  verbose_name='关联的税务表单')
-    outstanding_tax = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, 
-                                        verbose_name='截至目前欠缴税费情况', null=True, blank=True)
-    tax_types = models.TextField(verbose_name='涉及税费种', null=True, blank=True)
-    collection_effect = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, 
-                                          verbose_name='清欠成效', null=True, blank=True)
-
-    admin_only_fields = ['outstanding_tax', 'tax_types', 'collection_effect']
-    
-    class Meta:
-        verbose_name = '欠税信息'
-        verbose_name_plural = '欠税信息'
-    
-    def __str__(self):
-        return f"{self.tax_form.taxpayer_name or '未命名'}的欠税信息"
-
-
-class DailyManagement(models.Model):
-    """日常管理模型"""
-    INVOICE_CONTROL_CHOICES = [
-        ('未控票', '未控票'),
-        ('控票中', '控票中'),
-        ('数电票已限额', '数电票已限额'),
-        ('拟列入', '拟列入'),
-        ('限量供应', '限量供应'),
-        ('停止控票', '停止控票'),
-        ('暂停控票', '暂停控票'),
-    ]
-    
-    id = models.AutoField(primary_key=True)
-    tax_form = models.OneToOneField(TaxForm, on_delete=models.CASCADE, related_name='daily_management', 
-                                  verbose_name='关联的税务表单')
-    reminders = models.TextField(verbose_name='催缴提醒文书', null=True, blank=True)
-    invoice_control = models.CharField(max_length=20, choices=INVOICE_CONTROL_CHOICES, 
-                                     default='未控票', verbose_name='发票管控', null=True, blank=True)
-
-    # 根据 Database.md, 'reminders' 由管理员填写, 'invoice_control' 由用户填写
-    admin_only_fields = ['reminders']
-    
-    class Meta:
-        verbose_name = '日常管理'
-        verbose_name_plural = '日常管理'
-    
-    def __str__(self):
-        return f"{self.tax_form.taxpayer_name or '未命名'}的日常管理"
+class FormSection:
+    """
+    TaxForm 中原为一对一子表的一部分字段，API、导入和导出中仍表示为嵌套对象。
+
+    字段在 TaxForm 上的名称为 <部分名>_<字段名>，如 tax_info.outstanding_tax 对应 tax_info_outstanding_tax。
+    optional 的部分可以不填写，由 <部分名>_present 列标记，未填写时 API 输出 null。
+    """
+
+    def __init__(self, path, verbose_name, fields, admin_only_fields=(), optional=False):
+        self.path = path
+        self.name = path.rpartition('.')[2]
+        self.verbose_name = verbose_name
+        self.fields = fields
+        self.admin_only_fields = list(admin_only_fields)
+        self.presence_field = f'{self.name}_present' if optional else None
+
+    def column(self, name):
+        return f'{self.name}_{name}'
+
+    @property
+    def columns(self):
+        return [self.column(name) for name in self.fields]
+
+
+# 根据 Database.md 各部分的字段及仅管理员可填写的字段
+FORM_SECTIONS = [
+    FormSection('tax_info', '欠税信息', ['outstanding_tax', 'tax_types', 'collection_effect'],
+                admin_only_fields=['outstanding_tax', 'tax_types', 'collection_effect']),
+    FormSection('daily_management', '日常管理', ['reminders', 'invoice_control'],
+                admin_only_fields=['reminders']),
+    FormSection('daily_management.interview', '约谈警示', ['has_interview', 'document', 'interview_date'],
+                optional=True),
+    FormSection('daily_management.tax_payment_plan', '清缴欠税计划',
+                ['has_agreement', 'month_count', 'current_execution', 'unfulfilled_reason'], optional=True),
+    FormSection('daily_management.taxpayer_report', '欠税人报告事项',
+                ['periodic_report', 'asset_disposal_report', 'merger_division_report'], optional=True),
+    FormSection('daily_management.taxpayer_assets', '纳税人资产情况',
+                ['bank_accounts', 'real_estate', 'vehicles', 'other_assets'], optional=True),
+    FormSection('collection', '欠税追征',
+                ['guarantees', 'freezing', 'seizures', 'reminders', 'forced_collection', 'auction',
+                 'court_execution', 'rights_exercise', 'exit_prevention', 'prohibited_departure'],
+                admin_only_fields=['exit_prevention', 'prohibited_departure']),
+    FormSection('tax_payment_with_assets', '抵缴欠税情况', ['description']),
+]
+
+# 嵌套路径 -> 部分，如 'daily_management.interview'
+SECTIONS = {section.path: section for section in FORM_SECTIONS}
 
 
 class RiskAlert(models.Model):
-    """风险提醒模型"""
+    """风险提醒模型（API 中位于 daily_management.risk_alerts）"""
     id = models.AutoField(primary_key=True)
-    daily_management = models.ForeignKey(DailyManagement, on_delete=models.CASCADE, 
-                                       related_name='risk_alerts', verbose_name='关联的日常管理')
+    tax_form = models.ForeignKey(TaxForm, on_delete=models.CASCADE, related_name='risk_alerts',
+                                 verbose_name='关联的税务表单')
     document = models.CharField(max_length=255, verbose_name='提醒文书', null=True, blank=True)
     delivery_date = models.DateField(verbose_name='送达时间', null=True, blank=True)
 
@@ -122,141 +275,119 @@ class RiskAlert(models.Model):
         verbose_name_plural = '风险提醒'
     
     def __str__(self):
-        return f"{self.daily_management.tax_form.taxpayer_name or '未命名'}的风险提醒"
+        return f"{self.tax_form.taxpayer_name or '未命名'}的风险提醒"
 
 
-class Interview(models.Model):
-    """约谈警示模型"""
-    YES_NO_CHOICES = [
-        (True, '是'),
-        (False, '否'),
-    ]
-    
+class ArrearsSummary(models.Model):
+    """月度欠税汇总模型（按主管税务所、纳税人状态、发票管控分组，由台账变更增量刷新）"""
     id = models.AutoField(primary_key=True)
-    daily_management = models.OneToOneField(DailyManagement, on_delete=models.CASCADE, 
-                                          related_name='interview', verbose_name='关联的日常管理')
-    has_interview = models.BooleanField(choices=YES_NO_CHOICES, default=False, verbose_name='是否约谈', null=True, blank=True)
-    document = models.CharField(max_length=255, verbose_name='约谈文书或填写未约谈原因', blank=True, null=True)
-    interview_date = models.DateField(verbose_name='约谈时间', null=True, blank=True)
-
-    # 根据 Database.md, 所有字段均由用户填写
-    admin_only_fields = []
-    
+    month = models.CharField(max_length=6, verbose_name='月度', null=True, blank=True)
+    tax_authority_name = models.CharField(max_length=255, verbose_name='主管税务所名称', null=True, blank=True)
+    taxpayer_status = models.CharField(max_length=20, verbose_name='纳税人状态', null=True, blank=True)
+    invoice_control = models.CharField(max_length=20, verbose_name='发票管控', null=True, blank=True)
+    form_count = models.IntegerField(default=0, verbose_name='表单数')
+    outstanding_tax = models.DecimalField(max_digits=16, decimal_places=2, default=0.00,
+                                          verbose_name='欠缴税费合计')
+    collection_effect = models.DecimalField(max_digits=16, decimal_places=2, default=0.00,
+                                            verbose_name='清欠成效合计')
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name='刷新时间')
+
+    # 汇总的分组维度
+    dimensions = ['month', 'tax_authority_name', 'taxpayer_status', 'invoice_control']
+
     class Meta:
-        verbose_name = '约谈警示'
-        verbose_name_plural = '约谈警示'
-    
+        verbose_name = '月度欠税汇总'
+        verbose_name_plural = '月度欠税汇总'
+        indexes = [
+            models.Index(fields=['month', 'tax_authority_name'], name='arrears_summary_month_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.daily_management.tax_form.taxpayer_name or '未命名'}的约谈警示"
+        return f"{self.month or '无月份'} {self.tax_authority_name or '未知税务所'}的欠税汇总"
 
 
-class TaxPaymentPlan(models.Model):
-    """清缴欠税计划模型"""
-    YES_NO_CHOICES = [
-        (True, '是'),
-        (False, '否'),
-    ]
-    
-    id = models.AutoField(primary_key=True)
-    daily_management = models.OneToOneField(DailyManagement, on_delete=models.CASCADE, 
-                                          related_name='tax_payment_plan', verbose_name='关联的日常管理')
-    has_agreement = models.BooleanField(choices=YES_NO_CHOICES, default=False, verbose_name='有无订立', null=True, blank=True)
-    month_count = models.IntegerField(default=0, verbose_name='分期情况', null=True, blank=True)
-    current_execution = models.CharField(max_length=255, default='0', verbose_name='本期执行情况', null=True, blank=True)
-    unfulfilled_reason = models.TextField(default='无', verbose_name='未按期履行原因', null=True, blank=True)
+class TaxFormTombstoneQuerySet(models.QuerySet):
+    """已删除表单记录查询集"""
 
-    # 根据 Database.md, 所有字段均由用户填写
-    admin_only_fields = []
+    def visible_to(self, user):
+        """删除前分配给用户的表单，以及该用户负责的主管税务机关下的表单"""
+        if user.user_type == 'admin':
+            return self
+        authorities = AuthorityAssignment.objects.filter(assignee=user)
+        return self.filter(
+            Q(assignee=user) | Q(tax_authority_code__in=authorities.values('tax_authority_code'))
+        )
 
-    class Meta:
-        verbose_name = '清缴欠税计划'
-        verbose_name_plural = '清缴欠税计划'
-    
-    def __str__(self):
-        return f"{self.daily_management.tax_form.taxpayer_name or '未命名'}的清缴欠税计划"
+    def expired(self):
+        """超过保留期限的记录，增量同步的 since 早于该期限时客户端需要全量同步"""
+        return self.filter(deleted_at__lt=timezone.now() - settings.TOMBSTONE_RETENTION)
 
 
-class TaxpayerReport(models.Model):
-    """欠税人报告事项模型"""
+class TaxFormTombstone(models.Model):
+    """已删除表单记录模型，供客户端增量同步时移除本地数据"""
     id = models.AutoField(primary_key=True)
-    daily_management = models.OneToOneField(DailyManagement, on_delete=models.CASCADE, 
-                                          related_name='taxpayer_report', verbose_name='关联的日常管理')
-    periodic_report = models.TextField(default='无', verbose_name='定期报告', null=True, blank=True)
-    asset_disposal_report = models.TextField(default='无', verbose_name='处置资产报告', null=True, blank=True)
-    merger_division_report = models.TextField(default='无', verbose_name='合并分立报告', null=True, blank=True)
+    form_id = models.IntegerField(verbose_name='已删除的表单序号')
+    month = models.CharField(max_length=6, verbose_name='月度', null=True, blank=True)
+    # 记录删除前的可见范围，分配记录随表单一并删除后仍可按用户过滤
+    tax_authority_code = models.CharField(max_length=11, verbose_name='主管税务机关代码', null=True, blank=True)
+    assignee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name='+',
+                                 verbose_name='负责人', null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name='删除时间')
 
-    # 根据 Database.md, 所有字段均由用户填写
-    admin_only_fields = []
+    objects = TaxFormTombstoneQuerySet.as_manager()
 
     class Meta:
-        verbose_name = '欠税人报告事项'
-        verbose_name_plural = '欠税人报告事项'
-    
+        verbose_name = '已删除表单'
+        verbose_name_plural = '已删除表单'
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tax_form_tombstone_at_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.daily_management.tax_form.taxpayer_name or '未命名'}的欠税人报告事项"
+        return f"表单 {self.form_id} 已删除"
 
 
-class TaxpayerAssets(models.Model):
-    """纳税人资产情况模型"""
+class TaxFormAssignment(models.Model):
+    """表单分配模型，每张表单最多分配给一名用户"""
     id = models.AutoField(primary_key=True)
-    daily_management = models.OneToOneField(DailyManagement, on_delete=models.CASCADE, 
-                                          related_name='taxpayer_assets', verbose_name='关联的日常管理')
-    bank_accounts = models.TextField(default='无', verbose_name='存款账户情况', null=True, blank=True)
-    real_estate = models.TextField(default='无', verbose_name='不动产信息', null=True, blank=True)
-    vehicles = models.TextField(default='无', verbose_name='机动车（船舶）信息', null=True, blank=True)
-    other_assets = models.TextField(default='无', verbose_name='其他资产信息', null=True, blank=True)
-
-    # 根据 Database.md, 所有字段均由用户填写
-    admin_only_fields = []
+    tax_form = models.OneToOneField(TaxForm, on_delete=models.CASCADE, related_name='assignment',
+                                    verbose_name='关联的税务表单')
+    assignee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                 related_name='tax_form_assignments', verbose_name='负责人')
+    # 冗余表单的月度，按负责人和月度查找时无需关联表单表
+    month = models.CharField(max_length=6, verbose_name='月度', null=True, blank=True)
+    assigned_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name='+',
+                                    verbose_name='分配人', null=True, blank=True)
+    assigned_at = models.DateTimeField(auto_now=True, verbose_name='分配时间')
 
     class Meta:
-        verbose_name = '纳税人资产情况'
-        verbose_name_plural = '纳税人资产情况'
-    
-    def __str__(self):
-        return f"{self.daily_management.tax_form.taxpayer_name or '未命名'}的纳税人资产情况"
-
+        verbose_name = '表单分配'
+        verbose_name_plural = '表单分配'
+        indexes = [
+            models.Index(fields=['assignee', 'month', 'tax_form'], name='assignment_assignee_month_idx'),
+        ]
 
-class Collection(models.Model):
-    """欠税追征模型"""
-    id = models.AutoField(primary_key=True)
-    tax_form = models.OneToOneField(TaxForm, on_delete=models.CASCADE, related_name='collection', 
-                                  verbose_name='关联的税务表单')
-    guarantees = models.TextField(default='无', verbose_name='纳税担保', null=True, blank=True)
-    freezing = models.TextField(default='无', verbose_name='冻结', null=True, blank=True)
-    seizures = models.TextField(default='无', verbose_name='查封、扣押', null=True, blank=True)
-    reminders = models.TextField(default='无', verbose_name='催告', null=True, blank=True) # 在 Collection 表中，此字段填写方为"用户"
-    forced_collection = models.TextField(default='无', verbose_name='强制扣缴（金额）', null=True, blank=True)
-    auction = models.TextField(default='无', verbose_name='拍卖、变卖（金额）', null=True, blank=True)
-    court_execution = models.TextField(default='无', verbose_name='申请人民法院强制执行', null=True, blank=True)
-    rights_exercise = models.TextField(default='无', verbose_name='行使代位权、撤销权', null=True, blank=True)
-    exit_prevention = models.TextField(default='无', verbose_name='阻止出境', null=True, blank=True)
-    prohibited_departure = models.CharField(max_length=255, default='无', verbose_name='限制出境信息', null=True, blank=True)
-
-    # 根据 Database.md
-    admin_only_fields = ['exit_prevention', 'prohibited_departure']
-    
-    class Meta:
-        verbose_name = '欠税追征'
-        verbose_name_plural = '欠税追征'
-    
     def __str__(self):
-        return f"{self.tax_form.taxpayer_name or '未命名'}的欠税追征"
+        return f"表单 {self.tax_form_id} 分配给 {self.assignee}"
 
 
-class TaxPaymentWithAssets(models.Model):
-    """抵缴欠税情况模型"""
+class AuthorityAssignment(models.Model):
+    """主管税务机关分配模型，用户负责该机关下的全部表单"""
     id = models.AutoField(primary_key=True)
-    tax_form = models.OneToOneField(TaxForm, on_delete=models.CASCADE, 
-                                  related_name='tax_payment_with_assets', verbose_name='关联的税务表单')
-    description = models.TextField(default='无', verbose_name='抵缴欠税情况描述', null=True, blank=True)
-
-    # 根据 Database.md, 'description' 由用户填写
-    admin_only_fields = []
+    assignee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                 related_name='authority_assignments', verbose_name='负责人')
+    tax_authority_code = models.CharField(max_length=11, verbose_name='主管税务机关代码')
+    assigned_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name='+',
+                                    verbose_name='分配人', null=True, blank=True)
+    assigned_at = models.DateTimeField(auto_now=True, verbose_name='分配时间')
 
     class Meta:
-        verbose_name = '抵缴欠税情况'
-        verbose_name_plural = '抵缴欠税情况'
-    
+        verbose_name = '税务机关分配'
+        verbose_name_plural = '税务机关分配'
+        constraints = [
+            models.UniqueConstraint(fields=['assignee', 'tax_authority_code'],
+                                    name='authority_assignment_unique'),
+        ]
+
     def __str__(self):
-        return f"{self.tax_form.taxpayer_name or '未命名'}的抵缴欠税情况"
\ No newline at end of file
+        return f"{self.tax_authority_code} 分配给 {self.assignee}"
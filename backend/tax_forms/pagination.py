@@ -0,0 +1,123 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MonthKeysetPagination(BasePagination):
+    """
+    按 (month, id) 键集分页。
+
+    每一页都通过 WHERE (month, id) > (上一页最后一行) 定位，
+    因此无论翻到多深，查询开销都只与页大小相关。
+    月度为 NULL 的表单排在最后，单独按 id 翻页：各数据库对 NULL 的默认排序位置不同
+    （SQLite 在前，PostgreSQL 在后），两段分开查询时 (month, id) 索引在两种数据库上都能直接按序读取。
+    仅在请求中带有 cursor 或 page_size 参数时启用，未带参数时保持原有的不分页列表。
+    请求 count=true 时额外在 X-Total-Count 响应头中返回总行数。
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    count_header = 'X-Total-Count'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = '无效的分页游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total_count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            # 只统计行数，不带排序和关联加载
+            self.total_count = queryset.order_by().count()
+
+        cursor = self.decode_cursor(request)
+        # 多取一行用于判断是否还有下一页
+        limit = self.page_size + 1
+        results = []
+        if cursor is None or cursor[0] is not None:
+            dated = queryset.filter(month__isnull=False).order_by('month', 'id')
+            if cursor is not None:
+                dated = self.after_position(dated, *cursor)
+            results = list(dated[:limit])
+        if len(results) < limit:
+            # 有月度的表单已取完，接着取月度为 NULL 的表单
+            undated = queryset.filter(month__isnull=True).order_by('id')
+            if cursor is not None and cursor[0] is None:
+                undated = undated.filter(id__gt=cursor[1])
+            results += list(undated[:limit - len(results)])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def after_position(queryset, month, pk):
+        """排在 (month, pk) 之后的行，使用行值比较以便按 (month, id) 索引直接定位"""
+        qn = connections[queryset.db].ops.quote_name
+        model = queryset.model
+        table = qn(model._meta.db_table)
+        month_column = qn(model._meta.get_field('month').column)
+        pk_column = qn(model._meta.pk.column)
+        return queryset.extra(where=[f'({table}.{month_column}, {table}.{pk_column}) > (%s, %s)'],
+                              params=[month, pk])
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            month, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # 月度会作为查询参数绑定，只接受字符串或 null
+        if month is not None and not isinstance(month, str):
+            raise NotFound(self.invalid_cursor_message)
+        return month, pk
+
+    def encode_cursor(self, instance):
+        position = json.dumps([instance.month, instance.pk])
+        return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        response = Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+        if self.total_count is not None:
+            response[self.count_header] = self.total_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
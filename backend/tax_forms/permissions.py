@@ -0,0 +1,9 @@
+from rest_framework import permissions
+
+
+class IsAdminUserType(permissions.BasePermission):
+    """仅允许 user_type 为 admin 的用户访问"""
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.user_type == 'admin')
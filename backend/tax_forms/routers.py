@@ -0,0 +1,110 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# 只读副本的数据库别名，未在 DATABASES 中配置时所有读写都在主库
+REPLICA_ALIAS = 'replica'
+# 允许从副本读取的应用，用户、会话等仍从主库读取，避免副本延迟导致刚创建的账号无法登录
+REPLICA_APPS = {'tax_forms'}
+
+# 当前请求的读库状态，不在 replica_reads() 范围内时为 None
+_current = contextvars.ContextVar('replica_reads', default=None)
+
+
+class ReplicaReads:
+    """当前请求的读库状态：一旦写入过主库，之后的读取都回到主库，保证读到自己的写入"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.pinned = False
+
+
+def replica_configured(alias=REPLICA_ALIAS):
+    return alias in connections.databases
+
+
+@contextmanager
+def replica_reads(alias=REPLICA_ALIAS):
+    """在此范围内 tax_forms 的读取走只读副本，未配置副本时不起作用"""
+    if not replica_configured(alias):
+        yield None
+        return
+    state = ReplicaReads(alias)
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def iterate_with(state, iterator):
+    """流式响应在视图返回后才迭代，迭代时恢复视图中的读库状态"""
+    iterator = iter(iterator)
+    while True:
+        token = _current.set(state)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield item
+
+
+class ReplicaRouter:
+    """
+    读写分离路由。
+
+    写入始终在主库；读取默认也在主库，只有在 replica_reads() 范围内（由视图按 action 开启）
+    才走只读副本。同一请求中写入过主库或处于事务中时，读取回到主库。
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.pinned = True
+        # 从副本读出的对象保存时也写入主库
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == REPLICA_ALIAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库复制而来
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    视图集按 action 选择是否从只读副本读取，如 replica_actions = ('list', 'export')。
+
+    只对 GET / HEAD / OPTIONS 请求生效；流式响应在迭代内容时同样从副本读取。
+    """
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower())
+        if request.method not in SAFE_METHODS or action not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads() as state:
+            response = super().dispatch(request, *args, **kwargs)
+        if state is not None and response.streaming:
+            response.streaming_content = iterate_with(state, response.streaming_content)
+        return response
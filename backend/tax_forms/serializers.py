@@ -1,63 +1,123 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import (
-    TaxForm, TaxInfo, DailyManagement, Collection, TaxPaymentWithAssets,
-    RiskAlert, Interview, TaxPaymentPlan, TaxpayerReport, TaxpayerAssets
-)
+from .instrumentation import measure
+from .versioning import deferred_touch
+from .models import TaxForm, RiskAlert, SECTIONS
 
 class RiskAlertSerializer(serializers.ModelSerializer):
+    # 更新时按 id 对应已有的风险提醒，不带 id 的视为新增
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = RiskAlert
         fields = ['id', 'document', 'delivery_date']
 
-class InterviewSerializer(serializers.ModelSerializer):
+class SectionSerializer(serializers.ModelSerializer):
+    """
+    TaxForm 中一部分字段（见 FormSection）的嵌套表示，字段名不带部分名前缀。
+
+    source 为 '*'，校验后的数据直接合并到上级，如 tax_info.outstanding_tax -> tax_info_outstanding_tax。
+    可选的部分未填写时输出 null，提交该部分时同时标记为已填写。
+    """
+    section = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('source', '*')
+        super().__init__(*args, **kwargs)
+
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        for name in self.section.fields:
+            extra_kwargs.setdefault(name, {}).setdefault('source', self.section.column(name))
+        return extra_kwargs
+
+    def get_attribute(self, instance):
+        presence_field = self.section.presence_field
+        if presence_field and not getattr(instance, presence_field):
+            return None
+        return super().get_attribute(instance)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if self.section.presence_field:
+            value[self.section.presence_field] = True
+        return value
+
+class InterviewSerializer(SectionSerializer):
+    # 原为子表主键，合并后与表单 id 相同
+    id = serializers.IntegerField(source='pk', read_only=True)
+    section = SECTIONS['daily_management.interview']
+
     class Meta:
-        model = Interview
+        model = TaxForm
         fields = ['id', 'has_interview', 'document', 'interview_date']
 
-class TaxPaymentPlanSerializer(serializers.ModelSerializer):
+class TaxPaymentPlanSerializer(SectionSerializer):
+    id = serializers.IntegerField(source='pk', read_only=True)
+    section = SECTIONS['daily_management.tax_payment_plan']
+
     class Meta:
-        model = TaxPaymentPlan
+        model = TaxForm
         fields = ['id', 'has_agreement', 'month_count', 'current_execution', 'unfulfilled_reason']
 
-class TaxpayerReportSerializer(serializers.ModelSerializer):
+class TaxpayerReportSerializer(SectionSerializer):
+    id = serializers.IntegerField(source='pk', read_only=True)
+    section = SECTIONS['daily_management.taxpayer_report']
+
     class Meta:
-        model = TaxpayerReport
+        model = TaxForm
         fields = ['id', 'periodic_report', 'asset_disposal_report', 'merger_division_report']
 
-class TaxpayerAssetsSerializer(serializers.ModelSerializer):
+class TaxpayerAssetsSerializer(SectionSerializer):
+    id = serializers.IntegerField(source='pk', read_only=True)
+    section = SECTIONS['daily_management.taxpayer_assets']
+
     class Meta:
-        model = TaxpayerAssets
+        model = TaxForm
         fields = ['id', 'bank_accounts', 'real_estate', 'vehicles', 'other_assets']
 
-class DailyManagementSerializer(serializers.ModelSerializer):
+class DailyManagementSerializer(SectionSerializer):
     risk_alerts = RiskAlertSerializer(many=True, required=False)
     interview = InterviewSerializer(required=False)
     tax_payment_plan = TaxPaymentPlanSerializer(required=False)
     taxpayer_report = TaxpayerReportSerializer(required=False)
     taxpayer_assets = TaxpayerAssetsSerializer(required=False)
+    section = SECTIONS['daily_management']
     
     class Meta:
-        model = DailyManagement
+        model = TaxForm
         fields = ['reminders', 'invoice_control', 'risk_alerts', 'interview', 
                   'tax_payment_plan', 'taxpayer_report', 'taxpayer_assets']
 
-class TaxInfoSerializer(serializers.ModelSerializer):
+class TaxInfoSerializer(SectionSerializer):
+    section = SECTIONS['tax_info']
+
     class Meta:
-        model = TaxInfo
+        model = TaxForm
         fields = ['outstanding_tax', 'tax_types', 'collection_effect']
 
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(SectionSerializer):
+    section = SECTIONS['collection']
+
     class Meta:
-        model = Collection
+        model = TaxForm
         fields = ['guarantees', 'freezing', 'seizures', 'reminders',
                   'forced_collection', 'auction', 'court_execution',
                   'rights_exercise', 'exit_prevention', 'prohibited_departure']
 
-class TaxPaymentWithAssetsSerializer(serializers.ModelSerializer):
+class TaxPaymentWithAssetsSerializer(SectionSerializer):
+    section = SECTIONS['tax_payment_with_assets']
+
     class Meta:
-        model = TaxPaymentWithAssets
+        model = TaxForm
         fields = ['description']
 
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
 class TaxFormSerializer(serializers.ModelSerializer):
     tax_info = TaxInfoSerializer()
     daily_management = DailyManagementSerializer()
@@ -68,141 +128,95 @@ class TaxFormSerializer(serializers.ModelSerializer):
         model = TaxForm
         fields = ['id', 'month', 'taxpayer_name', 'credit_code', 'taxpayer_status',
                   'industry', 'tax_authority_code', 'tax_authority_name',
-                  'status', 'created_at', 'updated_at', 'tax_info',
+                  'status', 'version', 'created_at', 'updated_at', 'tax_info',
                   'daily_management', 'collection', 'tax_payment_with_assets']
-                  
+        # 状态只能通过状态流转接口变更（见 transitions.py），新建表单始终为草稿
+        read_only_fields = ['status']
+        # 启用请求计时时统计序列化耗时
+        list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+    @transaction.atomic
     def create(self, validated_data):
-        """处理嵌套数据的创建"""
-        tax_info_data = validated_data.pop('tax_info', {})
-        daily_management_data = validated_data.pop('daily_management', {})
-        risk_alerts_data = daily_management_data.pop('risk_alerts', [])
-        interview_data = daily_management_data.pop('interview', {})
-        tax_payment_plan_data = daily_management_data.pop('tax_payment_plan', {})
-        taxpayer_report_data = daily_management_data.pop('taxpayer_report', {})
-        taxpayer_assets_data = daily_management_data.pop('taxpayer_assets', {})
-        
-        collection_data = validated_data.pop('collection', {})
-        tax_payment_with_assets_data = validated_data.pop('tax_payment_with_assets', {})
-        
-        # 创建主表单记录
-        tax_form = TaxForm.objects.create(**validated_data)
-        
-        # 创建关联记录
-        TaxInfo.objects.create(tax_form=tax_form, **tax_info_data)
-        daily_management = DailyManagement.objects.create(tax_form=tax_form, **daily_management_data)
-        
-        # 创建日常管理相关的嵌套记录
-        for risk_alert_data in risk_alerts_data:
-            RiskAlert.objects.create(daily_management=daily_management, **risk_alert_data)
-        
-        if interview_data:
-            Interview.objects.create(daily_management=daily_management, **interview_data)
-            
-        if tax_payment_plan_data:
-            TaxPaymentPlan.objects.create(daily_management=daily_management, **tax_payment_plan_data)
-            
-        if taxpayer_report_data:
-            TaxpayerReport.objects.create(daily_management=daily_management, **taxpayer_report_data)
-            
-        if taxpayer_assets_data:
-            TaxpayerAssets.objects.create(daily_management=daily_management, **taxpayer_assets_data)
-        
-        Collection.objects.create(tax_form=tax_form, **collection_data)
-        TaxPaymentWithAssets.objects.create(tax_form=tax_form, **tax_payment_with_assets_data)
-        
+        """各部分都在表单本身的行中，一条 INSERT 创建表单，风险提醒再批量插入"""
+        with deferred_touch():
+            risk_alerts_data = validated_data.pop('risk_alerts', [])
+            tax_form = TaxForm.objects.create(**validated_data)
+            RiskAlert.objects.bulk_create(
+                RiskAlert(tax_form=tax_form, **self._without_id(risk_alert_data))
+                for risk_alert_data in risk_alerts_data
+            )
         return tax_form
     
+    @staticmethod
+    def _apply_changes(instance, data):
+        """把值发生变化的属性写到实例上，返回变化的字段名"""
+        changed = []
+        for attr, value in data.items():
+            if getattr(instance, attr) != value:
+                setattr(instance, attr, value)
+                changed.append(attr)
+        return changed
+
+    @staticmethod
+    def _without_id(data):
+        return {attr: value for attr, value in data.items() if attr != 'id'}
+
+    def _sync_risk_alerts(self, tax_form, risk_alerts_data):
+        """
+        按 id 对比风险提醒：批量更新有变化的、批量创建新增的、只删除被移除的，
+        未变化的提醒不产生任何写入，已有提醒的 id 保持不变。
+        """
+        existing = {alert.id: alert for alert in tax_form.risk_alerts.all()}
+        kept, changed, created = set(), [], []
+        changed_fields = set()
+        for data in risk_alerts_data:
+            alert = existing.get(data.get('id'))
+            if alert is None or alert.id in kept:
+                created.append(RiskAlert(tax_form=tax_form, **self._without_id(data)))
+                continue
+            kept.add(alert.id)
+            fields = [attr for attr, value in self._without_id(data).items() if getattr(alert, attr) != value]
+            if fields:
+                for attr in fields:
+                    setattr(alert, attr, data[attr])
+                changed.append(alert)
+                changed_fields.update(fields)
+
+        removed = set(existing) - kept
+        if not (removed or changed or created):
+            return False
+        if removed:
+            RiskAlert.objects.filter(id__in=removed).delete()
+        if changed:
+            RiskAlert.objects.bulk_update(changed, sorted(changed_fields))
+        if created:
+            RiskAlert.objects.bulk_create(created)
+        # 预取的风险提醒已过期
+        getattr(tax_form, '_prefetched_objects_cache', {}).pop('risk_alerts', None)
+        return True
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """处理嵌套数据的更新"""
-        # 处理税务信息更新
-        if 'tax_info' in validated_data:
-            tax_info_data = validated_data.pop('tax_info')
-            tax_info = instance.tax_info
-            for attr, value in tax_info_data.items():
-                setattr(tax_info, attr, value)
-            tax_info.save()
-        
-        # 处理日常管理更新
-        if 'daily_management' in validated_data:
-            daily_management_data = validated_data.pop('daily_management')
-            daily_management = instance.daily_management
-            
-            # 处理风险提醒更新
-            if 'risk_alerts' in daily_management_data:
-                risk_alerts_data = daily_management_data.pop('risk_alerts')
-                # 删除现有的风险提醒并创建新的
-                daily_management.risk_alerts.all().delete()
-                for risk_alert_data in risk_alerts_data:
-                    RiskAlert.objects.create(daily_management=daily_management, **risk_alert_data)
-            
-            # 处理约谈警示更新
-            if 'interview' in daily_management_data:
-                interview_data = daily_management_data.pop('interview')
-                interview = daily_management.interview
-                if interview:
-                    for attr, value in interview_data.items():
-                        setattr(interview, attr, value)
-                    interview.save()
-                else:
-                    Interview.objects.create(daily_management=daily_management, **interview_data)
-            
-            # 处理清缴欠税计划更新
-            if 'tax_payment_plan' in daily_management_data:
-                tax_payment_plan_data = daily_management_data.pop('tax_payment_plan')
-                plan = daily_management.tax_payment_plan
-                if plan:
-                    for attr, value in tax_payment_plan_data.items():
-                        setattr(plan, attr, value)
-                    plan.save()
-                else:
-                    TaxPaymentPlan.objects.create(daily_management=daily_management, **tax_payment_plan_data)
-            
-            # 处理欠税人报告事项更新
-            if 'taxpayer_report' in daily_management_data:
-                taxpayer_report_data = daily_management_data.pop('taxpayer_report')
-                report = daily_management.taxpayer_report
-                if report:
-                    for attr, value in taxpayer_report_data.items():
-                        setattr(report, attr, value)
-                    report.save()
-                else:
-                    TaxpayerReport.objects.create(daily_management=daily_management, **taxpayer_report_data)
-            
-            # 处理纳税人资产情况更新
-            if 'taxpayer_assets' in daily_management_data:
-                taxpayer_assets_data = daily_management_data.pop('taxpayer_assets')
-                assets = daily_management.taxpayer_assets
-                if assets:
-                    for attr, value in taxpayer_assets_data.items():
-                        setattr(assets, attr, value)
-                    assets.save()
-                else:
-                    TaxpayerAssets.objects.create(daily_management=daily_management, **taxpayer_assets_data)
-            
-            # 更新日常管理本身
-            for attr, value in daily_management_data.items():
-                setattr(daily_management, attr, value)
-            daily_management.save()
-        
-        # 处理欠税追征更新
-        if 'collection' in validated_data:
-            collection_data = validated_data.pop('collection')
-            collection = instance.collection
-            for attr, value in collection_data.items():
-                setattr(collection, attr, value)
-            collection.save()
-        
-        # 处理抵缴欠税情况更新
-        if 'tax_payment_with_assets' in validated_data:
-            tax_payment_data = validated_data.pop('tax_payment_with_assets')
-            tax_payment = instance.tax_payment_with_assets
-            for attr, value in tax_payment_data.items():
-                setattr(tax_payment, attr, value)
-            tax_payment.save()
-        
-        # 更新主表单
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        
-        instance.save()
+        """
+        处理嵌套数据的更新，只写入发生变化的列。
+
+        各部分的字段都在表单本身的行中，与风险提醒的变化一起由一条 UPDATE 写入并递增版本号。
+        """
+        risk_alerts_data = validated_data.pop('risk_alerts', None)
+        alerts_changed = False
+        if risk_alerts_data is not None:
+            with deferred_touch():
+                alerts_changed = self._sync_risk_alerts(instance, risk_alerts_data)
+
+        updated_at = validated_data.pop('updated_at', None)
+        changed = self._apply_changes(instance, validated_data)
+        if changed or alerts_changed:
+            if updated_at is not None:
+                instance.updated_at = updated_at
+            instance.save(update_fields=changed + ['updated_at'])
         return instance
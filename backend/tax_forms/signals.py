@@ -0,0 +1,68 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import TaxForm, RiskAlert, TaxFormTombstone, TaxFormAssignment
+from .summary import affects_summary, apply_delta, locked_summary_values, refresh_months_on_commit, summary_values
+from .versioning import touch_deferred
+
+
+@receiver([pre_save, pre_delete], sender=TaxForm)
+def lock_summary_values(sender, instance, using, update_fields=None, **kwargs):
+    """写入前锁定已有表单并读取汇总字段的原值，作为差额更新的依据"""
+    if instance._state.adding or not affects_summary(sender, update_fields):
+        return
+    instance._summary_before = locked_summary_values(instance, using)
+
+
+@receiver([post_save, post_delete], sender=TaxForm)
+def update_summary_for_form(sender, instance, using, created=False, update_fields=None, **kwargs):
+    """
+    表单变更时在同一事务内按差额更新所在月度（以及修改前月度）的欠税汇总。
+
+    无法取得锁定的原值时（不在事务中）或字段值不完整时，提交后整月重新聚合。
+    """
+    if not affects_summary(sender, update_fields):
+        return
+    deleted = kwargs['signal'] is post_delete
+    old = None if created else instance.__dict__.pop('_summary_before', None)
+    new = None if deleted else summary_values(instance, update_fields, old)
+    if (not created and old is None) or (not deleted and new is None):
+        months = {instance.month, getattr(instance, '_loaded_month', None)}
+        refresh_months_on_commit(months | ({old['month']} if old else set()), using)
+        return
+    apply_delta(old, new, using)
+
+
+@receiver(post_save, sender=TaxForm)
+def sync_assignment_month(sender, instance, using, created, update_fields=None, **kwargs):
+    """表单月度修改后同步分配记录中冗余的月度"""
+    if created or (update_fields is not None and 'month' not in update_fields):
+        return
+    if instance.month != getattr(instance, '_loaded_month', instance.month):
+        TaxFormAssignment.objects.using(using).filter(tax_form=instance).update(month=instance.month)
+
+
+@receiver(pre_delete, sender=TaxForm)
+def remember_assignee(sender, instance, using, **kwargs):
+    """分配记录会随表单级联删除，先记下负责人供删除记录使用"""
+    instance._deleted_assignee_id = (
+        TaxFormAssignment.objects.using(using).filter(tax_form_id=instance.id)
+        .values_list('assignee_id', flat=True).first()
+    )
+
+
+@receiver(post_delete, sender=TaxForm)
+def record_tombstone(sender, instance, using, **kwargs):
+    """记录被删除的表单，增量同步接口据此通知客户端；同时清理超过保留期限的记录"""
+    TaxFormTombstone.objects.using(using).create(
+        form_id=instance.id, month=instance.month, tax_authority_code=instance.tax_authority_code,
+        assignee_id=getattr(instance, '_deleted_assignee_id', None),
+    )
+    TaxFormTombstone.objects.using(using).expired().delete()
+
+
+@receiver([post_save, post_delete], sender=RiskAlert)
+def touch_form_for_risk_alert(sender, instance, using, **kwargs):
+    """风险提醒单独保存或删除时（如管理后台），在同一事务中递增所属表单的版本号"""
+    if not touch_deferred():
+        TaxForm.objects.using(using).filter(id=instance.tax_form_id).touch()
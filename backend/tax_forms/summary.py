@@ -0,0 +1,189 @@
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import TaxForm, ArrearsSummary
+
+# 参与汇总的字段，只有这些字段变化时才需要刷新
+SUMMARY_FIELDS = {
+    TaxForm: set(TaxForm.summary_fields),
+}
+
+# PostgreSQL 咨询锁的第一个键，与其他用途的咨询锁区分
+SUMMARY_LOCK_KEY = 20240301
+
+
+def affects_summary(model, fields):
+    """fields 为 None 表示整行写入（新建、删除或未指定 update_fields 的保存）"""
+    return fields is None or bool(SUMMARY_FIELDS.get(model, set()) & set(fields))
+
+
+def lock_months(months, using=DEFAULT_DB_ALIAS):
+    """
+    在当前事务内锁定这些月度的汇总，同一月度的刷新和差额更新依次进行。
+
+    PostgreSQL 使用事务级咨询锁，按月度排序加锁避免死锁；SQLite 的写事务本身已串行。
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for month in sorted({month or '' for month in months}):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', [SUMMARY_LOCK_KEY, month])
+
+
+def refresh_months(months, using=DEFAULT_DB_ALIAS):
+    """按月重新聚合台账并替换这些月度的汇总行"""
+    months = sorted({month for month in months if month})
+    if not months:
+        return
+    zero = Value(0, output_field=DecimalField(max_digits=16, decimal_places=2))
+    with transaction.atomic(using=using):
+        # 先加锁再聚合，读到的是前一次刷新或差额更新提交后的数据
+        lock_months(months, using)
+        groups = (
+            TaxForm.objects.using(using)
+            .filter(month__in=months)
+            .values('month', 'tax_authority_name', 'taxpayer_status',
+                    invoice_control_value=F('daily_management_invoice_control'))
+            .annotate(
+                form_count=Count('id'),
+                outstanding_tax_sum=Coalesce(Sum('tax_info_outstanding_tax'), zero),
+                collection_effect_sum=Coalesce(Sum('tax_info_collection_effect'), zero),
+            )
+            .order_by()
+        )
+        rows = [
+            ArrearsSummary(
+                month=group['month'],
+                tax_authority_name=group['tax_authority_name'],
+                taxpayer_status=group['taxpayer_status'],
+                invoice_control=group['invoice_control_value'],
+                form_count=group['form_count'],
+                outstanding_tax=group['outstanding_tax_sum'],
+                collection_effect=group['collection_effect_sum'],
+            )
+            for group in groups
+        ]
+        ArrearsSummary.objects.using(using).filter(month__in=months).delete()
+        ArrearsSummary.objects.using(using).bulk_create(rows)
+
+
+def summary_values(instance, fields=None, current=None):
+    """
+    表单写入后参与汇总的字段值，字段未加载或为表达式时返回 None。
+
+    fields 为 update_fields 时，未写入的字段取 current（写入前锁定读取的数据库中的值），
+    不使用实例上可能已过期的值。
+    """
+    names = [name for name in TaxForm.summary_fields if fields is None or name in fields]
+    if set(names) & instance.get_deferred_fields():
+        return None
+    values = {name: getattr(instance, name) for name in names}
+    if any(isinstance(value, Combinable) for value in values.values()):
+        return None
+    if fields is not None:
+        if current is None:
+            return None
+        values = {**current, **values}
+    return values
+
+
+def locked_summary_values(instance, using=DEFAULT_DB_ALIAS):
+    """
+    在当前事务内锁定表单行并读取参与汇总的字段值，不在事务中时返回 None。
+
+    加载实例时的读取未加锁，并发修改同一表单时各自减去的旧值会相同，汇总随之偏离。
+    """
+    if not connections[using].in_atomic_block:
+        return None
+    return (
+        TaxForm.objects.using(using).select_for_update().filter(pk=instance.pk)
+        .values(*TaxForm.summary_fields).first()
+    )
+
+
+def _summary_key(values):
+    return (values['month'], values['tax_authority_name'], values['taxpayer_status'],
+            values['daily_management_invoice_control'])
+
+
+def _amount(value):
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+def apply_delta(old, new, using=DEFAULT_DB_ALIAS):
+    """
+    在当前事务内把单张表单的变化按差额累加到汇总行上。
+
+    old 和 new 为修改前后参与汇总的字段值，新建时 old 为 None，删除时 new 为 None。
+    """
+    deltas = {}
+    for values, sign in ((old, -1), (new, 1)):
+        if not values or not values['month']:
+            continue
+        count, tax, effect = deltas.get(_summary_key(values), (0, Decimal('0'), Decimal('0')))
+        deltas[_summary_key(values)] = (
+            count + sign,
+            tax + sign * _amount(values['tax_info_outstanding_tax']),
+            effect + sign * _amount(values['tax_info_collection_effect']),
+        )
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    with transaction.atomic(using=using):
+        lock_months({key[0] for key in deltas}, using)
+        for (month, authority, taxpayer_status, invoice_control), (count, tax, effect) in sorted(
+                deltas.items(), key=lambda item: tuple(part or '' for part in item[0])):
+            rows = ArrearsSummary.objects.using(using).filter(
+                month=month, tax_authority_name=authority,
+                taxpayer_status=taxpayer_status, invoice_control=invoice_control,
+            )
+            updated = rows.update(
+                form_count=F('form_count') + count,
+                outstanding_tax=F('outstanding_tax') + tax,
+                collection_effect=F('collection_effect') + effect,
+                refreshed_at=timezone.now(),
+            )
+            if not updated:
+                ArrearsSummary.objects.using(using).create(
+                    month=month, tax_authority_name=authority,
+                    taxpayer_status=taxpayer_status, invoice_control=invoice_control,
+                    form_count=count, outstanding_tax=tax, collection_effect=effect,
+                )
+            rows.filter(form_count__lte=0).delete()
+
+
+def refresh_months_on_commit(months, using=DEFAULT_DB_ALIAS):
+    """
+    在当前事务提交后刷新指定月度的汇总。
+
+    同一事务中的多次调用会合并为一次刷新，不在事务中时立即刷新。
+    """
+    months = {month for month in months if month}
+    if not months:
+        return
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        refresh_months(months, using)
+        return
+
+    # run_on_commit 在提交或回滚后会被替换为新的列表，借此判断待刷新集合是否仍属于当前事务
+    pending = getattr(connection, '_pending_summary_refresh', None)
+    if pending is not None and pending['hooks'] is connection.run_on_commit and not pending['done']:
+        pending['months'].update(months)
+        return
+
+    pending = {'hooks': connection.run_on_commit, 'months': set(months), 'done': False}
+
+    def refresh():
+        pending['done'] = True
+        refresh_months(pending['months'], using)
+
+    transaction.on_commit(refresh, using=using)
+    connection._pending_summary_refresh = pending
@@ -0,0 +1,182 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bulk import bulk_create_with_ids
+from .carry_forward import CarryForward, MONTH_RE
+from .models import TaxForm, RiskAlert
+from .summary import refresh_months_on_commit
+
+# 统一社会信用代码（GB 32100-2015）使用的字符，不含 I、O、S、V、Z
+CREDIT_CODE_CHARS = '0123456789ABCDEFGHJKLMNPQRTUWXY'
+CREDIT_CODE_WEIGHTS = [pow(3, i, 31) for i in range(17)]
+# 组织机构代码（GB 11714）本体代码的加权因子
+ORGANIZATION_CODE_WEIGHTS = [3, 7, 9, 10, 5, 8, 4, 2]
+
+REGIONS = ['南浔', '湖州', '吴兴', '德清', '长兴', '安吉', '练市', '双林', '菱湖', '和孚']
+WORDS = ['华', '金', '鑫', '恒', '泰', '瑞', '丰', '达', '盛', '嘉', '宏', '源', '通', '远', '新', '利', '兴', '安']
+INDUSTRIES = [
+    ('房地产开发经营', '置业'), ('建筑装饰业', '建设'), ('木质家具制造', '木业'),
+    ('纺织服装制造', '纺织'), ('批发业', '贸易'), ('道路货物运输', '物流'),
+    ('餐饮业', '餐饮'), ('软件和信息技术服务业', '科技'),
+]
+TAX_AUTHORITIES = [
+    ('13305033100', '南浔税务所'), ('13305033200', '练市税务所'),
+    ('13305033300', '双林税务所'), ('13305033400', '菱湖税务所'),
+]
+TAX_TYPES = ['增值税', '企业所得税', '城市维护建设税', '房产税', '城镇土地使用税', '印花税']
+INVOICE_CONTROLS = [choice for choice, _ in TaxForm.INVOICE_CONTROL_CHOICES]
+
+
+def credit_code_check_char(code17):
+    total = sum(CREDIT_CODE_CHARS.index(char) * weight for char, weight in zip(code17, CREDIT_CODE_WEIGHTS))
+    return CREDIT_CODE_CHARS[(31 - total % 31) % 31]
+
+
+def is_valid_credit_code(code):
+    return (len(code) == 18 and all(char in CREDIT_CODE_CHARS for char in code)
+            and credit_code_check_char(code[:17]) == code[17])
+
+
+def organization_code(body):
+    """8 位数字本体代码加上校验码"""
+    remainder = 11 - sum(int(char) * weight for char, weight in zip(body, ORGANIZATION_CODE_WEIGHTS)) % 11
+    return body + {10: 'X', 11: '0'}.get(remainder, str(remainder))
+
+
+def next_month(month):
+    year, mon = int(month[:4]), int(month[4:])
+    if mon == 12:
+        return f'{year + 1}01'
+    return f'{year}{mon + 1:02d}'
+
+
+class LedgerGenerator:
+    """
+    生成模拟台账，用于压测和基准测试。
+
+    首月为 companies 家欠税企业，之后每月先按结转规则（CarryForward）把欠税余额大于 0 的表单
+    结转到新月度，再随机清缴一部分欠税，并新增少量新欠税企业。
+    同一 seed 生成的数据相同。
+    """
+    chunk_size = 500
+
+    def __init__(self, companies, months, start_month='202401', seed=None, new_company_rate=0.05):
+        if not MONTH_RE.match(start_month):
+            raise ValueError(f'无效的月度: {start_month}')
+        self.companies = companies
+        self.months = months
+        self.start_month = start_month
+        self.new_company_rate = new_company_rate
+        self.random = random.Random(seed)
+        # 组织机构代码本体按序号递增，保证信用代码不重复
+        self.serial = self.random.randrange(10 ** 7)
+
+    def run(self):
+        started = time.monotonic()
+        month = self.start_month
+        created = self.create_companies(month, self.companies)
+        carried = 0
+        for _ in range(self.months - 1):
+            month = next_month(month)
+            carried += CarryForward(month).run()['forms']
+            self.settle_arrears(month)
+            created += self.create_companies(month, max(1, int(self.companies * self.new_company_rate)))
+        return {
+            'created': created,
+            'carried': carried,
+            'last_month': month,
+            'elapsed': round(time.monotonic() - started, 3),
+        }
+
+    def credit_code(self):
+        self.serial += 1
+        authority = '9' + self.random.choice('123')
+        division = '330503'
+        organization = organization_code(f'{self.serial % 10 ** 8:08d}')
+        code17 = authority + division + organization
+        return code17 + credit_code_check_char(code17)
+
+    def company_name(self, suffix):
+        words = ''.join(self.random.sample(WORDS, 2))
+        return f'湖州{self.random.choice(REGIONS)}{words}{suffix}有限公司'
+
+    def create_companies(self, month, count):
+        remaining = count
+        while remaining > 0:
+            size = min(remaining, self.chunk_size)
+            with transaction.atomic():
+                self.write(month, size)
+            remaining -= size
+        return count
+
+    def write(self, month, count):
+        rand = self.random
+        forms = []
+        for _ in range(count):
+            industry, suffix = rand.choice(INDUSTRIES)
+            code, authority = rand.choice(TAX_AUTHORITIES)
+            forms.append(TaxForm(
+                month=month,
+                taxpayer_name=self.company_name(suffix),
+                credit_code=self.credit_code(),
+                taxpayer_status=rand.choices(['正常', '⾮正常', '注销'], weights=[85, 10, 5])[0],
+                industry=industry,
+                tax_authority_code=code,
+                tax_authority_name=authority,
+                tax_info_outstanding_tax=Decimal(rand.randint(1000, 5000000)) / 100,
+                tax_info_tax_types='、'.join(rand.sample(TAX_TYPES, rand.randint(1, 3))),
+                tax_info_collection_effect=Decimal('0.00'),
+                daily_management_reminders=f'浔税通〔{month[:4]}〕{rand.randint(100, 9999)}号',
+                daily_management_invoice_control=rand.choice(INVOICE_CONTROLS),
+                interview_present=True,
+                interview_has_interview=rand.random() < 0.3,
+                tax_payment_plan_present=True,
+                tax_payment_plan_has_agreement=rand.random() < 0.2,
+                tax_payment_plan_month_count=rand.choice([0, 3, 6, 12]),
+                taxpayer_report_present=True,
+                taxpayer_assets_present=True,
+            ))
+        bulk_create_with_ids(TaxForm, forms)
+
+        first_day = datetime.date(int(month[:4]), int(month[4:]), 1)
+        alerts = []
+        for form in forms:
+            for _ in range(rand.choices([0, 1, 2, 3], weights=[40, 35, 20, 5])[0]):
+                alerts.append(RiskAlert(
+                    tax_form=form,
+                    document=f'浔税通〔{month[:4]}〕{rand.randint(100, 9999)}号',
+                    delivery_date=first_day + datetime.timedelta(days=rand.randrange(28)),
+                ))
+        RiskAlert.objects.bulk_create(alerts)
+        refresh_months_on_commit({month})
+
+    def settle_arrears(self, month):
+        """结转后的表单随机清缴：约 15% 全部缴清，约 30% 缴纳一部分"""
+        forms = list(TaxForm.objects.filter(month=month).only('id', 'tax_info_outstanding_tax'))
+        changed = []
+        now = timezone.now()
+        for form in forms:
+            roll = self.random.random()
+            if roll < 0.15:
+                paid = form.tax_info_outstanding_tax
+            elif roll < 0.45:
+                paid = (form.tax_info_outstanding_tax * Decimal(self.random.randint(10, 90)) / 100).quantize(
+                    Decimal('0.01'))
+            else:
+                continue
+            form.tax_info_outstanding_tax -= paid
+            form.tax_info_collection_effect = paid
+            form.version = F('version') + 1
+            form.updated_at = now
+            changed.append(form)
+        with transaction.atomic():
+            TaxForm.objects.bulk_update(
+                changed, ['tax_info_outstanding_tax', 'tax_info_collection_effect', 'version', 'updated_at'],
+                batch_size=self.chunk_size)
+            refresh_months_on_commit({month})
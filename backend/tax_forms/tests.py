@@ -1,4 +1,1247 @@
-from django.test import TestCase
-from .models import TaxForm
+import base64
+import csv
+import datetime
+import functools
+import io
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from unittest import skipUnless
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.core.management import call_command, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import TaxForm, RiskAlert, TaxFormAssignment, TaxFormTombstone, ArrearsSummary
+from .benchmark import ApiBenchmark
+from .database_copy import register_sqlite, unregister
+from .filters import TaxFormFilter
+from .form_cache import CACHE_ALIAS
+from .importers import RosterImporter, iter_rows
+from .instrumentation import histogram
+from .readers import tax_form_reader
+from .routers import REPLICA_ALIAS, replica_reads
+from .serializers import TaxFormSerializer
+from .synthetic import LedgerGenerator, credit_code_check_char, is_valid_credit_code
+
+
+def make_form_payload(index=0, month='202503', **overrides):
+    """构造一份完整的嵌套表单数据"""
+    payload = {
+        'month': month,
+        'taxpayer_name': f'测试纳税人{index}',
+        'credit_code': f'91330503MA28C{index:05d}',
+        'taxpayer_status': '正常',
+        'industry': '房地产开发经营',
+        'tax_authority_code': '13305033100',
+        'tax_authority_name': '南浔税务所',
+        'tax_info': {
+            'outstanding_tax': '1000.00',
+            'tax_types': '企业所得税',
+            'collection_effect': '0.00',
+        },
+        'daily_management': {
+            'reminders': '浔税南通〔2022〕1011号',
+            'invoice_control': '未控票',
+            'risk_alerts': [
+                {'document': '浔税南通〔2025〕543号', 'delivery_date': '2025-02-15'},
+                {'document': '浔税南通〔2025〕544号', 'delivery_date': '2025-02-16'},
+            ],
+            'interview': {'has_interview': True, 'document': '约谈', 'interview_date': '2024-01-05'},
+            'tax_payment_plan': {'has_agreement': False, 'month_count': 3},
+            'taxpayer_report': {'periodic_report': '无'},
+            'taxpayer_assets': {'bank_accounts': '无'},
+        },
+        'collection': {'guarantees': '无'},
+        'tax_payment_with_assets': {'description': '无'},
+    }
+    payload.update(overrides)
+    return payload
+
+
+def create_form(index=0, **overrides):
+    serializer = TaxFormSerializer(data=make_form_payload(index, **overrides))
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+class TaxFormAPITestCase(TestCase):
+    def setUp(self):
+        # 测试之间数据库会回滚，表单ID和版本号可能重复，需清空序列化缓存
+        caches[CACHE_ALIAS].clear()
+        self.admin = User.objects.create_user(username='admin', password='pass', user_type='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def patch(self, form, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/api/tax-forms/{form.id}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        # 汇总表的差额更新与表单写入在同一事务中，这里只统计表单本身的写入
+        summary_table = ArrearsSummary._meta.db_table
+        writes = [q['sql'] for q in ctx.captured_queries
+                  if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE')) and summary_table not in q['sql']]
+        return response, writes
+
+
+class TaxFormQueryCountTest(TaxFormAPITestCase):
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tax-forms/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        for i in range(2):
+            create_form(i)
+        small = self.count_list_queries()
+
+        for i in range(2, 12):
+            create_form(i)
+        large = self.count_list_queries()
+
+        self.assertEqual(small, large)
+
+    def test_retrieve_loads_nested_data(self):
+        form = create_form()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/tax-forms/{form.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['daily_management']['risk_alerts']), 2)
+        # 一次查询加载表单及其各部分，一次查询批量加载风险提醒
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+class TaxFormPaginationTest(TaxFormAPITestCase):
+    def test_list_is_unpaginated_by_default(self):
+        create_form(0)
+        response = self.client.get('/api/tax-forms/')
+        self.assertIsInstance(response.data, list)
+
+    def test_keyset_pagination_walks_month_then_id(self):
+        for i, month in enumerate(['202503', '202501', '202502', '202501', '202503']):
+            create_form(i, month=month)
+        expected = list(TaxForm.objects.order_by('month', 'id').values_list('id', flat=True))
+
+        seen = []
+        response = self.client.get('/api/tax-forms/', {'page_size': 2, 'count': 'true'})
+        self.assertEqual(response['X-Total-Count'], '5')
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+            self.assertNotIn('X-Total-Count', response)
+
+        self.assertEqual(seen, expected)
+
+    def test_null_months_come_last(self):
+        for i, month in enumerate(['202502', None, '202501', None]):
+            create_form(i, month=month)
+        expected = list(TaxForm.objects.filter(month__isnull=False).order_by('month', 'id')
+                        .values_list('id', flat=True))
+        expected += list(TaxForm.objects.filter(month__isnull=True).order_by('id').values_list('id', flat=True))
+
+        seen = []
+        url, params = '/api/tax-forms/', {'page_size': 1}
+        while url:
+            response = self.client.get(url, params)
+            seen.extend(row['id'] for row in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', base64.urlsafe_b64encode(b'[[1], 2]').decode('ascii')):
+            response = self.client.get('/api/tax-forms/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class TaxFormFilterTest(TaxFormAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.low = create_form(0, month='202503', tax_info={'outstanding_tax': '10.00'})
+        self.high = create_form(1, month='202503', tax_info={'outstanding_tax': '5000.00'},
+                                tax_authority_code='13305033200')
+        self.other_month = create_form(2, month='202502', tax_info={'outstanding_tax': '800.00'})
+        self.high.daily_management_invoice_control = '控票中'
+        self.high.save()
+
+    def list_ids(self, **params):
+        response = self.client.get('/api/tax-forms/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_filter_by_month_and_authority(self):
+        self.assertEqual(self.list_ids(month='202503'), [self.low.id, self.high.id])
+        self.assertEqual(self.list_ids(tax_authority_code='13305033200'), [self.high.id])
+
+    def test_filter_by_nested_fields(self):
+        self.assertEqual(self.list_ids(invoice_control='控票中'), [self.high.id])
+        self.assertEqual(self.list_ids(outstanding_tax_min='100', outstanding_tax_max='1000'),
+                         [self.other_month.id])
+
+    def test_ordering_by_nested_field(self):
+        self.assertEqual(self.list_ids(ordering='-outstanding_tax'),
+                         [self.high.id, self.other_month.id, self.low.id])
+
+    @skipUnless(connection.vendor == 'sqlite', '按 SQLite 的查询计划格式判断')
+    def test_every_filter_uses_an_index(self):
+        params = {'month': '202503', 'tax_authority_code': '13305033200', 'taxpayer_status': '正常',
+                  'status': 'draft', 'invoice_control': '控票中', 'outstanding_tax_min': '100'}
+        for name, value in params.items():
+            plan = TaxFormFilter(data={name: value}, queryset=TaxForm.objects.all()).qs.explain()
+            self.assertNotIn('SCAN tax_forms_taxform', plan, name)
+
+    def test_invalid_choice_is_rejected(self):
+        response = self.client.get('/api/tax-forms/', {'status': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RosterImportTest(TaxFormAPITestCase):
+    def upload(self, content, name='roster.csv', **data):
+        data['file'] = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post('/api/tax-forms/import/', data, format='multipart')
+
+    def roster(self, count, start=0):
+        lines = ['月度,纳税人名称,统一社会信用代码,主管税务机关代码,截至目前欠缴税费情况']
+        for i in range(start, start + count):
+            lines.append(f'202504,公司{i},91330503MA28C{i:05d},13305033100,{i}.50')
+        return '\n'.join(lines)
+
+    def test_import_creates_forms_with_all_sections(self):
+        response = self.upload(self.roster(3))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(TaxForm.objects.filter(month='202504').count(), 3)
+        form = TaxForm.objects.get(credit_code='91330503MA28C00002')
+        self.assertEqual(form.tax_info_outstanding_tax, Decimal('2.50'))
+        self.assertEqual(TaxForm.objects.filter(interview_present=True).count(), 3)
+        data = self.client.get(f'/api/tax-forms/{form.id}/').data
+        self.assertEqual(data['daily_management']['interview']['document'], None)
+        self.assertEqual(data['tax_payment_with_assets']['description'], '无')
+
+    def import_queries(self, content, batch_size):
+        importer = RosterImporter(batch_size=batch_size)
+        with CaptureQueriesContext(connection) as ctx:
+            importer.run(iter_rows(io.BytesIO(content.encode('utf-8')), 'roster.csv', 'utf-8'))
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tax_forms_taxform"')]
+        return len(inserts), len(ctx.captured_queries) - len(inserts)
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        _, baseline = self.import_queries(self.roster(2), batch_size=10)
+        # 只有批量 INSERT 的条数随行数增长，为 ceil(行数 / batch_size)，batch_size 不超过数据库的参数上限
+        fields = [field for field in TaxForm._meta.concrete_fields if not field.primary_key]
+        limit = connection.ops.bulk_batch_size(fields, [None] * 40)
+        for start, batch_size in ((100, 10), (200, 20)):
+            inserts, others = self.import_queries(self.roster(40, start=start), batch_size)
+            self.assertEqual(inserts, math.ceil(40 / min(batch_size, limit)))
+            self.assertEqual(others, baseline)
+
+    def test_import_skips_existing_and_reports_errors(self):
+        self.upload(self.roster(2))
+        content = self.roster(3) + '\n202504,,,,abc'
+        response = self.upload(content)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual(response.data['errors'][0]['row'], 5)
+
+    def test_unknown_encoding_is_rejected(self):
+        response = self.upload(self.roster(1), encoding='nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TaxForm.objects.exists())
+
+    def test_command_reports_encoding_errors(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(self.roster(1).encode('gbk'))
+            file.flush()
+            with self.assertRaisesMessage(CommandError, '不支持的编码'):
+                call_command('import_roster', file.name, encoding='nosuch')
+            with self.assertRaises(CommandError):
+                call_command('import_roster', file.name, encoding='utf-8')
+        self.assertFalse(TaxForm.objects.exists())
+
+    def test_import_requires_admin(self):
+        user = User.objects.create_user(username='collector', password='pass', user_type='user')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.upload(self.roster(1)).status_code, 403)
+
+
+class CarryForwardTest(TaxFormAPITestCase):
+    def carry_forward(self, **data):
+        return self.client.post('/api/tax-forms/carry-forward/', data, format='json')
+
+    def test_copies_forms_with_arrears_and_nested_data(self):
+        source = create_form(0, month='202503')
+        create_form(1, month='202503', tax_info={'outstanding_tax': '0.00'})
+
+        response = self.carry_forward(month='202504')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['forms'], 1)
+
+        copy = TaxForm.objects.get(month='202504')
+        self.assertEqual(copy.carried_from_id, source.id)
+        self.assertEqual(copy.credit_code, source.credit_code)
+        self.assertEqual(copy.tax_info_outstanding_tax, Decimal('1000.00'))
+        self.assertTrue(copy.interview_present)
+        self.assertEqual(copy.interview_document, '约谈')
+        self.assertEqual(copy.collection_guarantees, '无')
+        self.assertEqual(
+            list(copy.risk_alerts.order_by('id').values_list('document', flat=True)),
+            ['浔税南通〔2025〕543号', '浔税南通〔2025〕544号'],
+        )
+        self.assertEqual(RiskAlert.objects.count(), 6)
+
+    def test_copies_assignments(self):
+        collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        assigned = create_form(0, month='202503')
+        create_form(1, month='202503')
+        self.client.post('/api/tax-forms/bulk-assign/', {'assignee': collector.id, 'ids': [assigned.id]},
+                         format='json')
+
+        self.assertEqual(self.carry_forward(month='202504').data['copied']['tax_forms_taxformassignment'], 1)
+        copy = TaxForm.objects.get(month='202504', carried_from=assigned)
+        self.assertEqual((copy.status, copy.version), ('assigned', 2))
+        self.assertEqual((copy.assignment.assignee, copy.assignment.month), (collector, '202504'))
+        self.assertEqual(TaxForm.objects.get(month='202504', carried_from__isnull=False, assignment__isnull=True)
+                         .status, 'draft')
+
+    def test_is_idempotent_per_month(self):
+        create_form(0, month='202412')
+        self.assertEqual(self.carry_forward(month='202501').data['forms'], 1)
+        self.assertEqual(self.carry_forward(month='202501').data['forms'], 0)
+        self.assertEqual(TaxForm.objects.filter(month='202501').count(), 1)
+
+    def test_invalid_month(self):
+        self.assertEqual(self.carry_forward(month='2025-04').status_code, 400)
+
+
+class PreviousDefaultsTest(TaxFormAPITestCase):
+    def test_returns_previous_month_in_one_batch(self):
+        previous = create_form(0, month='202502')
+        create_form(1, month='202502')
+        current = create_form(0, month='202503')
+        unmatched = create_form(2, month='202503')
+        january = create_form(1, month='202501')
+        create_form(1, month='202412')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tax-forms/previous-defaults/',
+                                       {'ids': f'{current.id},{unmatched.id},{january.id}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[current.id]['id'], previous.id)
+        self.assertIsNone(response.data[unmatched.id])
+        # 不跨年
+        self.assertIsNone(response.data[january.id])
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_previous_form_need_not_be_assigned_to_user(self):
+        collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        previous = create_form(0, month='202502')
+        current = create_form(0, month='202503')
+        hidden = create_form(1, month='202503')
+        self.client.post('/api/tax-forms/bulk-assign/', {'assignee': collector.id, 'ids': [current.id]},
+                         format='json')
+
+        self.client.force_authenticate(collector)
+        response = self.client.get('/api/tax-forms/previous-defaults/', {'ids': f'{current.id},{hidden.id}'})
+        self.assertEqual(response.data[current.id]['id'], previous.id)
+        self.assertIsNone(response.data[hidden.id])
+
+
+class BulkUpdateTest(TaxFormAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.forms = [create_form(i) for i in range(5)]
+        self.ids = [form.id for form in self.forms]
+
+    def bulk_update(self, **data):
+        return self.client.post('/api/tax-forms/bulk-update/', data, format='json')
+
+    def test_fill_nested_fields_with_one_statement(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.bulk_update(ids=self.ids[:3], values={
+                'daily_management.invoice_control': '控票中',
+                'daily_management.interview.document': '统一约谈',
+            })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(set(response.data['updated_at']), set(self.ids[:3]))
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        invoice_controls = TaxForm.objects.order_by('id').values_list(
+            'daily_management_invoice_control', flat=True)
+        self.assertEqual(list(invoice_controls), ['控票中'] * 3 + ['未控票'] * 2)
+        self.assertEqual(TaxForm.objects.filter(interview_document='统一约谈').count(), 3)
+
+    def test_fill_by_filter_with_field_shorthand(self):
+        response = self.bulk_update(filter={'month': '202503'}, field='collection.freezing', value='已冻结')
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(TaxForm.objects.filter(collection_freezing='已冻结').count(), 5)
+
+    def test_invalid_values_are_rejected(self):
+        response = self.bulk_update(ids=self.ids, values={'daily_management.invoice_control': 'bad'})
+        self.assertEqual(response.status_code, 400)
+        response = self.bulk_update(ids=self.ids, values={'daily_management.risk_alerts': []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_and_bad_ids_are_rejected(self):
+        user = User.objects.create_user(username='collector', password='pass', user_type='user')
+        self.client.force_authenticate(user)
+        response = self.bulk_update(ids=self.ids, values={'status': 'approved'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TaxForm.objects.filter(status='approved').exists())
+        response = self.bulk_update(ids=['abc'], values={'collection.freezing': '已冻结'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_only_fields_are_rejected_for_users(self):
+        user = User.objects.create_user(username='collector', password='pass', user_type='user')
+        self.client.force_authenticate(user)
+        response = self.bulk_update(ids=self.ids, values={'tax_info.outstanding_tax': '1.00'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PartialUpdateTest(TaxFormAPITestCase):
+    def test_single_cell_edit_writes_only_changed_column(self):
+        form = create_form()
+        response, writes = self.patch(form, {'daily_management': {'invoice_control': '控票中'}})
+        self.assertEqual(response.data['daily_management']['invoice_control'], '控票中')
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "tax_forms_taxform" SET "updated_at"'))
+        self.assertIn('"daily_management_invoice_control"', writes[0])
+        self.assertNotIn('"collection_guarantees"', writes[0])
+
+    def test_unchanged_values_are_not_written(self):
+        form = create_form()
+        _, writes = self.patch(form, {
+            'taxpayer_name': form.taxpayer_name,
+            'collection': {'guarantees': '无'},
+            'daily_management': {'interview': {'document': '约谈'}},
+        })
+        self.assertEqual(writes, [])
+
+    def test_absent_optional_section_is_filled_in(self):
+        form = create_form()
+        TaxForm.objects.filter(id=form.id).update(interview_present=False)
+        response = self.client.get(f'/api/tax-forms/{form.id}/')
+        self.assertIsNone(response.data['daily_management']['interview'])
+        response, _ = self.patch(form, {'daily_management': {'interview': {'document': '补录'}}})
+        self.assertEqual(response.data['daily_management']['interview']['document'], '补录')
+        self.assertTrue(TaxForm.objects.get(id=form.id).interview_present)
+
+
+class RiskAlertSyncTest(TaxFormAPITestCase):
+    def test_alerts_are_reconciled_by_id(self):
+        form = create_form()
+        first, second = form.risk_alerts.order_by('id')
+
+        response, writes = self.patch(form, {'daily_management': {'risk_alerts': [
+            {'id': first.id, 'document': first.document, 'delivery_date': '2025-02-15'},
+            {'id': second.id, 'document': '已修改', 'delivery_date': '2025-02-16'},
+            {'document': '新增', 'delivery_date': '2025-03-01'},
+        ]}})
+        # 一条 UPDATE 风险提醒、一条 INSERT、一条 UPDATE 表单
+        self.assertEqual(len(writes), 3)
+        alerts = response.data['daily_management']['risk_alerts']
+        self.assertEqual([a['id'] for a in alerts[:2]], [first.id, second.id])
+        self.assertEqual(alerts[1]['document'], '已修改')
+        self.assertEqual(alerts[2]['document'], '新增')
+
+    def test_removed_alerts_are_deleted(self):
+        form = create_form()
+        first, second = form.risk_alerts.order_by('id')
+        response, writes = self.patch(form, {'daily_management': {'risk_alerts': [
+            {'id': second.id, 'document': second.document, 'delivery_date': '2025-02-16'},
+        ]}})
+        self.assertEqual(len(writes), 2)
+        self.assertEqual([a['id'] for a in response.data['daily_management']['risk_alerts']], [second.id])
+        self.assertFalse(RiskAlert.objects.filter(id=first.id).exists())
+
+
+class ExportTest(TaxFormAPITestCase):
+    def test_csv_export_streams_flattened_rows(self):
+        form = create_form(0)
+        create_form(1, month='202502')
+        response = self.client.get('/api/tax-forms/export/', {'month': '202503'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        header, row = rows[0], rows[1]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(header[:3], ['序号', '月度', '纳税人名称'])
+        self.assertIn('欠税信息-截至目前欠缴税费情况', header)
+        self.assertEqual(row[0], str(form.id))
+        self.assertEqual(row[header.index('风险提醒-送达时间')], '2025/2/15\n2025/2/16')
+        self.assertEqual(row[header.index('约谈警示-是否约谈')], '是')
+
+    def test_xlsx_export(self):
+        create_form(0)
+        response = self.client.get('/api/tax-forms/export/', {'export_format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+
+class ArrearsSummaryTest(TaxFormAPITestCase):
+    def statistics(self, **params):
+        response = self.client.get('/api/tax-forms/statistics/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_summary_tracks_serializer_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            form = create_form(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_form(1, tax_info={'outstanding_tax': '500.00', 'collection_effect': '20.00'})
+
+        rows = self.statistics(month='202503', group_by='tax_authority_name')
+        self.assertEqual(rows, [{
+            'tax_authority_name': '南浔税务所',
+            'form_count': 2,
+            'outstanding_tax': Decimal('1500.00'),
+            'collection_effect': Decimal('20.00'),
+        }])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tax-forms/{form.id}/', {
+                'month': '202504',
+                'daily_management': {'invoice_control': '控票中'},
+            }, format='json')
+        by_month = self.statistics(group_by='month,invoice_control')
+        self.assertEqual([(r['month'], r['invoice_control'], r['form_count']) for r in by_month],
+                         [('202503', '未控票', 1), ('202504', '控票中', 1)])
+
+    def test_single_form_changes_apply_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            forms = [create_form(i) for i in range(2)]
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tax-forms/{forms[0].id}/', {
+                'tax_info': {'outstanding_tax': '400.00'},
+            }, format='json')
+        self.assertFalse([q['sql'] for q in queries if 'GROUP BY' in q['sql']])
+        rows = self.statistics(group_by='month')
+        self.assertEqual([(r['form_count'], r['outstanding_tax']) for r in rows], [(2, Decimal('1400.00'))])
+
+        TaxForm.objects.get(id=forms[1].id).delete()
+        rows = self.statistics(group_by='month')
+        self.assertEqual([(r['form_count'], r['outstanding_tax']) for r in rows], [(1, Decimal('400.00'))])
+
+    def test_delta_uses_current_values_not_stale_instance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            form = create_form(0)
+        stale = TaxForm.objects.get(id=form.id)
+        fresh = TaxForm.objects.get(id=form.id)
+        fresh.tax_info_outstanding_tax = Decimal('400.00')
+        with transaction.atomic():
+            fresh.save(update_fields=['tax_info_outstanding_tax'])
+        stale.daily_management_invoice_control = '控票中'
+        with transaction.atomic():
+            stale.save(update_fields=['daily_management_invoice_control'])
+
+        rows = self.statistics(group_by='invoice_control')
+        self.assertEqual([(r['invoice_control'], r['form_count'], r['outstanding_tax']) for r in rows],
+                         [('控票中', 1, Decimal('400.00'))])
+
+    def test_summary_tracks_bulk_operations(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            forms = [create_form(i) for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tax-forms/bulk-update/', {
+                'ids': [forms[0].id], 'values': {'tax_info.outstanding_tax': '0.00'},
+            }, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tax-forms/carry-forward/', {'month': '202504'}, format='json')
+
+        rows = self.statistics(group_by='month')
+        self.assertEqual([(r['month'], r['form_count'], r['outstanding_tax']) for r in rows],
+                         [('202503', 3, Decimal('2000.00')), ('202504', 2, Decimal('2000.00'))])
+
+    def test_invalid_dimension(self):
+        response = self.client.get('/api/tax-forms/statistics/', {'group_by': 'industry'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChangedSinceTest(TaxFormAPITestCase):
+    def changed_since(self, since, client=None, **params):
+        response = (client or self.client).get('/api/tax-forms/changed-since/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    @override_settings(SYNC_OVERLAP=datetime.timedelta(0))
+    def test_returns_changed_and_deleted_forms(self):
+        unchanged = create_form(0)
+        edited = create_form(1)
+        removed = create_form(2)
+        since = self.changed_since(unchanged.updated_at.isoformat())['timestamp']
+
+        self.client.patch(f'/api/tax-forms/{edited.id}/', {'industry': '制造业'}, format='json')
+        self.client.delete(f'/api/tax-forms/{removed.id}/')
+
+        data = self.changed_since(since)
+        self.assertEqual([form['id'] for form in data['changed']], [edited.id])
+        self.assertEqual(data['changed'][0]['industry'], '制造业')
+        self.assertEqual(data['deleted'], [removed.id])
+
+    def test_invalid_since(self):
+        response = self.client.get('/api/tax-forms/changed-since/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_overlaps_late_commits(self):
+        form = create_form(0)
+        since = self.changed_since(form.updated_at.isoformat())['timestamp']
+        # 模拟时间戳早于上次查询、但在查询之后才提交的修改
+        late = create_form(1)
+        TaxForm.objects.filter(id=late.id).update(updated_at=timezone.now() - datetime.timedelta(seconds=5))
+
+        data = self.changed_since(since)
+        self.assertIn(late.id, [row['id'] for row in data['changed']])
+
+    def test_deleted_respects_visibility_and_month(self):
+        collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        forms = [create_form(i) for i in range(3)]
+        april = create_form(3, month='202504')
+        self.client.post('/api/tax-forms/bulk-assign/', {
+            'assignee': collector.id, 'ids': [forms[0].id, april.id],
+        }, format='json')
+        since = timezone.now().isoformat()
+        for form in [*forms, april]:
+            self.client.delete(f'/api/tax-forms/{form.id}/')
+
+        client = APIClient()
+        client.force_authenticate(collector)
+        self.assertEqual(self.changed_since(since, client)['deleted'], [forms[0].id, april.id])
+        self.assertEqual(self.changed_since(since, client, month='202504')['deleted'], [april.id])
+        self.assertEqual(len(self.changed_since(since)['deleted']), 4)
+
+    def test_expired_tombstones_are_pruned(self):
+        forms = [create_form(i) for i in range(2)]
+        self.client.delete(f'/api/tax-forms/{forms[0].id}/')
+        TaxFormTombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=31))
+        self.client.delete(f'/api/tax-forms/{forms[1].id}/')
+        self.assertEqual(list(TaxFormTombstone.objects.values_list('form_id', flat=True)), [forms[1].id])
+
+        since = (timezone.now() - datetime.timedelta(days=31)).isoformat()
+        response = self.client.get('/api/tax-forms/changed-since/', {'since': since})
+        self.assertEqual(response.status_code, 410)
+
+
+class VersionTest(TaxFormAPITestCase):
+    def test_new_form_starts_at_version_one(self):
+        self.assertEqual(create_form().version, 1)
+
+    def test_child_edit_bumps_version_once(self):
+        form = create_form()
+        response, writes = self.patch(form, {
+            'collection': {'freezing': '已冻结'},
+            'daily_management': {'interview': {'document': '再次约谈'}},
+        })
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(len([sql for sql in writes if 'tax_forms_taxform' in sql]), 1)
+        self.assertGreater(TaxForm.objects.get(id=form.id).updated_at, form.updated_at)
+
+    def test_direct_risk_alert_save_bumps_version(self):
+        form = create_form()
+        alert = form.risk_alerts.first()
+        alert.document = '后台修改'
+        alert.save()
+        self.assertEqual(TaxForm.objects.get(id=form.id).version, 2)
+
+    def test_direct_risk_alert_delete_bumps_version(self):
+        form = create_form()
+        form.risk_alerts.first().delete()
+        self.assertEqual(TaxForm.objects.get(id=form.id).version, 2)
+        RiskAlert.objects.filter(tax_form=form).delete()
+        self.assertEqual(TaxForm.objects.get(id=form.id).version, 3)
+
+    def test_bulk_fill_bumps_version(self):
+        form = create_form()
+        self.client.post('/api/tax-forms/bulk-update/', {
+            'ids': [form.id], 'values': {'collection.freezing': '已冻结'},
+        }, format='json')
+        self.assertEqual(TaxForm.objects.get(id=form.id).version, 2)
+
+
+class ConditionalRequestTest(TaxFormAPITestCase):
+    def test_if_none_match_returns_304_without_serializing(self):
+        form = create_form()
+        response = self.client.get(f'/api/tax-forms/{form.id}/')
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{form.id}-1"')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/tax-forms/{form.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.client.patch(f'/api/tax-forms/{form.id}/', {'industry': '制造业'}, format='json')
+        response = self.client.get(f'/api/tax-forms/{form.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{form.id}-2"')
+
+    def test_if_match_rejects_stale_version(self):
+        form = create_form()
+        response = self.client.patch(f'/api/tax-forms/{form.id}/', {'industry': '制造业'},
+                                     format='json', HTTP_IF_MATCH=f'"{form.id}-1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{form.id}-2"')
+
+        response = self.client.patch(f'/api/tax-forms/{form.id}/', {'industry': '批发业'},
+                                     format='json', HTTP_IF_MATCH=f'"{form.id}-1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(TaxForm.objects.get(id=form.id).industry, '制造业')
+
+    def test_if_match_on_missing_form(self):
+        response = self.client.patch('/api/tax-forms/999/', {'industry': '制造业'},
+                                     format='json', HTTP_IF_MATCH='"999-1"')
+        self.assertEqual(response.status_code, 404)
+
+
+class SerializedFormCacheTest(TaxFormAPITestCase):
+    def test_list_serializes_only_changed_forms(self):
+        forms = [create_form(i) for i in range(3)]
+        first = self.client.get('/api/tax-forms/').data
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/tax-forms/').data
+        self.assertEqual(second, first)
+        # 全部命中缓存，只查询 id 和版本号
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.client.patch(f'/api/tax-forms/{forms[1].id}/', {'industry': '制造业'}, format='json')
+        with CaptureQueriesContext(connection) as ctx:
+            third = self.client.get('/api/tax-forms/').data
+        self.assertEqual([form['industry'] for form in third], ['房地产开发经营', '制造业', '房地产开发经营'])
+        self.assertEqual(third[1]['version'], 2)
+        reloaded = [q['sql'] for q in ctx.captured_queries if 'tax_forms_riskalert' in q['sql']]
+        self.assertEqual(len(reloaded), 1)
+
+    def test_paginated_list_uses_cache(self):
+        for i in range(3):
+            create_form(i)
+        self.client.get('/api/tax-forms/', {'page_size': 2})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tax-forms/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class ValuesReaderTest(TaxFormAPITestCase):
+    def test_output_matches_serializer_byte_for_byte(self):
+        create_form(0)
+        # 未填写可选部分、空值和无风险提醒的表单
+        sparse = make_form_payload(1, industry=None)
+        sparse['tax_info'] = {'outstanding_tax': '12.5'}
+        sparse['daily_management'] = {'invoice_control': '控票中'}
+        create_form(1, **sparse)
+        form = create_form(2)
+        TaxForm.objects.filter(id=form.id).update(interview_present=False, tax_info_tax_types=None)
+
+        queryset = TaxForm.objects.order_by('id')
+        expected = JSONRenderer().render(TaxFormSerializer(queryset.with_related(), many=True).data)
+        actual = JSONRenderer().render(tax_form_reader().read(queryset))
+        self.assertEqual(actual, expected)
+
+    def test_read_uses_two_queries(self):
+        for i in range(5):
+            create_form(i)
+        with CaptureQueriesContext(connection) as ctx:
+            data = tax_form_reader().read(TaxForm.objects.order_by('id'))
+        self.assertEqual(len(data), 5)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+class SparseFieldsetTest(TaxFormAPITestCase):
+    def test_fields_limit_output_and_columns(self):
+        create_form()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tax-forms/', {
+                'fields': 'taxpayer_name,daily_management.invoice_control,collection'})
+        self.assertEqual(response.status_code, 200)
+        form = response.data[0]
+        self.assertEqual(set(form), {'id', 'version', 'taxpayer_name', 'daily_management', 'collection'})
+        self.assertEqual(form['daily_management'], {'invoice_control': '未控票'})
+        self.assertEqual(form['collection']['guarantees'], '无')
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        for column in ('tax_info_outstanding_tax', 'taxpayer_assets_bank_accounts', 'tax_forms_riskalert'):
+            self.assertNotIn(column, sql)
+
+    def test_expand_adds_nested_objects_to_scalar_fields(self):
+        form = create_form()
+        response = self.client.get(f'/api/tax-forms/{form.id}/', {'expand': 'tax_info'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tax_info']['outstanding_tax'], '1000.00')
+        self.assertIn('credit_code', response.data)
+        self.assertNotIn('daily_management', response.data)
+
+    def test_sparse_response_has_its_own_etag(self):
+        form = create_form()
+        url = f'/api/tax-forms/{form.id}/'
+        full_etag = self.client.get(url)['ETag']
+        sparse = self.client.get(url, {'fields': 'taxpayer_name'})
+        self.assertNotEqual(sparse['ETag'], full_etag)
+        self.assertTrue(sparse['ETag'].startswith(f'"{form.id}-1-'))
+
+        response = self.client.get(url, {'fields': 'taxpayer_name'}, HTTP_IF_NONE_MATCH=full_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, {'fields': 'taxpayer_name'}, HTTP_IF_NONE_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.patch(url, {'industry': '制造业'}, format='json', HTTP_IF_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_field_is_rejected(self):
+        create_form()
+        response = self.client.get('/api/tax-forms/', {'fields': 'tax_info.missing'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tax_info.missing', str(response.data['fields']))
+        for fields in ('id.x', 'tax_info,tax_info.missing', 'taxpayer_name.x'):
+            response = self.client.get('/api/tax-forms/', {'fields': fields})
+            self.assertEqual(response.status_code, 400, fields)
+
+
+class AssignmentTest(TaxFormAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        self.forms = [create_form(i) for i in range(3)]
+
+    def assign(self, data):
+        return self.client.post('/api/tax-forms/bulk-assign/', data, format='json')
+
+    def test_bulk_assign_limits_user_queryset(self):
+        response = self.assign({'assignee': self.collector.id, 'ids': [self.forms[0].id, self.forms[1].id]})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(TaxForm.objects.filter(status='assigned').count(), 2)
+
+        client = APIClient()
+        client.force_authenticate(self.collector)
+        response = client.get('/api/tax-forms/')
+        self.assertEqual([form['id'] for form in response.data], [self.forms[0].id, self.forms[1].id])
+        self.assertEqual(client.get(f'/api/tax-forms/{self.forms[2].id}/').status_code, 404)
+
+        self.assign({'assignee': None, 'ids': [self.forms[1].id]})
+        response = client.get('/api/tax-forms/', {'month': '202503'})
+        self.assertEqual([form['id'] for form in response.data], [self.forms[0].id])
+        self.assertEqual(TaxForm.objects.get(id=self.forms[1].id).status, 'draft')
+
+    def test_assign_by_tax_authority(self):
+        other = create_form(3, tax_authority_code='13305033200')
+        self.assign({'assignee': self.collector.id, 'tax_authority_codes': ['13305033200']})
+        client = APIClient()
+        client.force_authenticate(self.collector)
+        response = client.get('/api/tax-forms/')
+        self.assertEqual([form['id'] for form in response.data], [other.id])
+
+    def test_authority_assignment_uses_same_status_rule(self):
+        other = create_form(3, tax_authority_code='13305033200')
+        self.assign({'assignee': self.collector.id, 'tax_authority_codes': ['13305033200']})
+        self.assertEqual(TaxForm.objects.get(id=other.id).status, 'assigned')
+        self.assertEqual(TaxForm.objects.get(id=self.forms[0].id).status, 'draft')
+
+        self.assign({'assignee': self.collector.id, 'ids': [other.id]})
+        self.assign({'assignee': None, 'tax_authority_codes': ['13305033200']})
+        self.assertEqual(TaxForm.objects.get(id=other.id).status, 'assigned')
+        self.assign({'assignee': None, 'ids': [other.id]})
+        self.assertEqual(TaxForm.objects.get(id=other.id).status, 'draft')
+
+    def test_reassignment_removes_form_from_previous_assignee_sync(self):
+        other = User.objects.create_user(username='other', password='pass', user_type='user')
+        form = self.forms[0]
+        self.assign({'assignee': self.collector.id, 'ids': [form.id]})
+        since = timezone.now().isoformat()
+        self.assign({'assignee': other.id, 'ids': [form.id]})
+
+        def changed_since(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            return client.get('/api/tax-forms/changed-since/', {'since': since}).data
+
+        previous = changed_since(self.collector)
+        self.assertEqual((previous['changed'], previous['deleted']), ([], [form.id]))
+        current = changed_since(other)
+        self.assertEqual(([row['id'] for row in current['changed']], current['deleted']), ([form.id], []))
+
+        self.assign({'assignee': self.collector.id, 'ids': [form.id]})
+        previous = changed_since(self.collector)
+        self.assertEqual(([row['id'] for row in previous['changed']], previous['deleted']), ([form.id], []))
+
+    def test_assignment_lookup_uses_index(self):
+        queryset = TaxFormAssignment.objects.filter(assignee=self.collector, month='202503').values('tax_form_id')
+        self.assertIn('assignment_assignee_month_idx', queryset.explain())
+
+    def test_only_admin_can_assign(self):
+        self.client.force_authenticate(self.collector)
+        response = self.assign({'assignee': self.collector.id, 'ids': [self.forms[0].id]})
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_ids(self):
+        response = self.assign({'assignee': self.collector.id, 'ids': ['abc']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_assignee(self):
+        response = self.assign({'assignee': 999, 'ids': [self.forms[0].id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assignee', response.data['errors'])
+
+
+class StatusTransitionTest(TaxFormAPITestCase):
+    def transition(self, data):
+        return self.client.post('/api/tax-forms/bulk-transition/', data, format='json')
+
+    def test_bulk_transitions_report_per_id_outcomes(self):
+        forms = [create_form(i) for i in range(3)]
+        ids = [form.id for form in forms]
+        TaxForm.objects.filter(id=ids[2]).update(status='approved')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.transition({'action': 'submit', 'ids': ids + [999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        results = response.data['results']
+        self.assertEqual(results[ids[0]], {'ok': True, 'status': 'submitted'})
+        self.assertFalse(results[ids[2]]['ok'])
+        self.assertEqual(results[ids[2]]['status'], 'approved')
+        self.assertFalse(results[999]['ok'])
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        response = self.transition({'action': 'approve', 'ids': ids})
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(TaxForm.objects.filter(status='approved').count(), 3)
+        self.assertEqual(TaxForm.objects.get(id=ids[0]).version, 3)
+
+    def test_reopen_returns_to_assigned_when_form_has_assignee(self):
+        collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        forms = [create_form(i) for i in range(2)]
+        ids = [form.id for form in forms]
+        self.transition({'action': 'assign', 'ids': ids[:1], 'assignee': collector.id})
+        self.transition({'action': 'submit', 'ids': ids})
+        response = self.transition({'action': 'reopen', 'ids': ids})
+        self.assertEqual(response.data['results'][ids[0]]['status'], 'assigned')
+        self.assertEqual(response.data['results'][ids[1]]['status'], 'draft')
+
+    def test_single_form_submit_endpoint(self):
+        collector = User.objects.create_user(username='collector', password='pass', user_type='user')
+        form = create_form()
+        self.transition({'action': 'assign', 'ids': [form.id], 'assignee': collector.id})
+
+        client = APIClient()
+        client.force_authenticate(collector)
+        response = client.post(f'/api/tax-forms/{form.id}/submit/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': form.id, 'ok': True, 'status': 'submitted'})
+        self.assertEqual(client.post(f'/api/tax-forms/{form.id}/submit/').status_code, 409)
+        self.assertEqual(client.post(f'/api/tax-forms/{form.id}/approve/').status_code, 403)
+        self.assertEqual(client.post('/api/tax-forms/999/submit/').status_code, 404)
+
+    def test_unknown_action(self):
+        response = self.transition({'action': 'archive', 'ids': [1]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_is_read_only_in_form_api(self):
+        form = create_form(0, status='approved')
+        self.assertEqual(form.status, 'draft')
+        response = self.client.patch(f'/api/tax-forms/{form.id}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'draft')
+        self.assertEqual(TaxForm.objects.get(id=form.id).status, 'draft')
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTest(TaxFormAPITestCase):
+    def setUp(self):
+        super().setUp()
+        histogram.reset()
+
+    def test_server_timing_header_and_histogram(self):
+        form = create_form()
+        response = self.client.get(f'/api/tax-forms/{form.id}/')
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="2 queries"', header)
+        self.assertIn('serialize;dur=', header)
+        self.assertIn('render;dur=', header)
+
+        stats = self.client.get('/api/timings/').data['views']['GET taxform-detail']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['max_queries'], 2)
+        self.assertEqual(sum(stats['histogram'].values()), 1)
+
+    def test_stats_are_admin_only(self):
+        user = User.objects.create_user(username='collector', password='pass', user_type='user')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/timings/').status_code, 403)
+
+
+class RequestTimingDisabledTest(TaxFormAPITestCase):
+    def test_no_header_by_default(self):
+        response = self.client.get('/api/tax-forms/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class LedgerGeneratorTest(TaxFormAPITestCase):
+    def test_generated_ledger_follows_carry_forward_rule(self):
+        result = LedgerGenerator(companies=20, months=3, start_month='202412', seed=1).run()
+        self.assertEqual(result['last_month'], '202502')
+        self.assertEqual(TaxForm.objects.filter(month='202412').count(), 20)
+
+        codes = list(TaxForm.objects.values_list('month', 'credit_code'))
+        self.assertTrue(all(is_valid_credit_code(code) for _, code in codes))
+        self.assertEqual(len(codes), len(set(codes)))
+
+        # 只有上月欠税余额大于 0 的表单被结转
+        carried = TaxForm.objects.filter(month='202502', carried_from__isnull=False)
+        self.assertEqual(carried.count(), TaxForm.objects.filter(
+            month='202501', tax_info_outstanding_tax__gt=0).count())
+        self.assertFalse(carried.filter(carried_from__tax_info_outstanding_tax__lte=0).exists())
+        self.assertTrue(RiskAlert.objects.exists())
+
+    def test_credit_code_checksum(self):
+        self.assertTrue(is_valid_credit_code('91330503MA28C5R75X'[:17] + credit_code_check_char('91330503MA28C5R75')))
+        self.assertFalse(is_valid_credit_code('91330503MA28C5R75I'))
+
+
+class ApiBenchmarkTest(TaxFormAPITestCase):
+    def test_report_covers_all_scenarios(self):
+        LedgerGenerator(companies=10, months=2, seed=1).run()
+        report = ApiBenchmark(self.admin, iterations=2, bulk_size=5).run()
+        self.assertEqual(set(report['scenarios']), {
+            'list_page', 'list_month', 'list_month_cold', 'list_sparse', 'retrieve', 'patch', 'bulk_create', 'export_csv'})
+        for stats in report['scenarios'].values():
+            self.assertEqual(stats['requests'], 2)
+            self.assertTrue(all(code.startswith('2') for code in stats['status_codes']))
+            self.assertGreater(stats['peak_memory_kb'], 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite 专用配置')
+class SQLiteConcurrencyTest(TransactionTestCase):
+    writers = 8
+    updates = 5
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
+
+    def test_parallel_writers_do_not_lock(self):
+        forms = [create_form(i) for i in range(4)]
+        barrier = threading.Barrier(self.writers)
+        errors = []
+
+        def write(writer):
+            try:
+                barrier.wait()
+                for i in range(self.updates):
+                    form_id = forms[(writer + i) % len(forms)].id
+                    # 与视图一致：读取和写入在同一事务中
+                    with transaction.atomic():
+                        instance = TaxForm.objects.get(id=form_id)
+                        serializer = TaxFormSerializer(instance, partial=True, data={
+                            'tax_info': {'outstanding_tax': f'{writer * 100 + i}.00'},
+                            'daily_management': {'reminders': f'催告{writer}-{i}'},
+                        })
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        versions = TaxForm.objects.filter(id__in=[form.id for form in forms]).values_list('version', flat=True)
+        self.assertEqual(sum(versions), len(forms) + self.writers * self.updates)
+
+
+class CopyFromSQLiteTest(TransactionTestCase):
+    target = 'copy_target'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 目标库是测试期间临时注册的别名，不受测试框架管理，用完直接删除文件
+        handle, cls.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        register_sqlite(cls.target, cls.path)
+        call_command('migrate', database=cls.target, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        unregister(cls.target)
+        os.remove(cls.path)
+        super().tearDownClass()
+
+    def test_copies_ledger_preserving_ids(self):
+        user = User.objects.create_user(username='collector', password='pass', user_type='user')
+        group = Group.objects.create(name='征收组')
+        group.permissions.add(Permission.objects.get(codename='view_taxform'))
+        user.groups.add(group)
+        user.user_permissions.add(Permission.objects.get(codename='change_taxform'))
+        first = create_form(0)
+        second = create_form(1)
+        TaxForm.objects.filter(id=first.id).delete()
+        TaxFormAssignment.objects.create(tax_form=second, month=second.month, assignee=user)
+        source = TaxForm.objects.get(id=second.id)
+
+        call_command('copy_from_sqlite', connection.settings_dict['NAME'], database=self.target,
+                     batch_size=1, stdout=io.StringIO())
+
+        copied = TaxForm.objects.using(self.target).get(id=second.id)
+        self.assertEqual((copied.version, copied.created_at, copied.updated_at),
+                         (source.version, source.created_at, source.updated_at))
+        self.assertEqual(RiskAlert.objects.using(self.target).filter(tax_form=copied).count(), 2)
+        self.assertEqual(TaxFormAssignment.objects.using(self.target).get().assignee_id, user.id)
+        copied_user = User.objects.using(self.target).get(id=user.id)
+        self.assertEqual(copied_user.password, user.password)
+        # 用户组和权限关联一并复制，权限按代码对应到目标库的权限
+        self.assertEqual(list(copied_user.groups.values_list('id', 'name')), [(group.id, '征收组')])
+        self.assertEqual(list(copied_user.user_permissions.values_list('codename', flat=True)), ['change_taxform'])
+        self.assertEqual(list(Group.objects.using(self.target).get().permissions.values_list('codename', flat=True)),
+                         ['view_taxform'])
+        # 新建记录从最大 ID 之后继续编号
+        self.assertGreater(TaxForm.objects.using(self.target).create(month='202503').id, second.id)
+
+        with self.assertRaisesMessage(CommandError, '已有数据'):
+            call_command('copy_from_sqlite', connection.settings_dict['NAME'], database=self.target,
+                         stdout=io.StringIO())
+
+    def test_refuses_source_at_other_migration_level(self):
+        create_form()
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        shutil.copyfile(connection.settings_dict['NAME'], path)
+        with sqlite3.connect(path) as source:
+            source.execute("DELETE FROM django_migrations WHERE app = 'tax_forms' AND name = "
+                           "(SELECT MAX(name) FROM django_migrations WHERE app = 'tax_forms')")
+
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes('tax_forms')[0][1]
+        with self.assertRaisesMessage(CommandError, f'迁移版本与代码不一致，未执行: tax_forms.{latest}'):
+            call_command('copy_from_sqlite', path, database=self.target, stdout=io.StringIO())
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 用测试主库文件充当副本，TransactionTestCase 的数据已提交，副本连接可以读到
+        register_sqlite(REPLICA_ALIAS, connection.settings_dict['NAME'])
+
+    @classmethod
+    def tearDownClass(cls):
+        unregister(REPLICA_ALIAS)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.admin = User.objects.create_user(username='admin', password='pass', user_type='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.form = create_form()
+
+    def request(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300)
+        return len(primary.captured_queries), len(replica.captured_queries)
+
+    def test_opted_in_reads_use_replica(self):
+        for url in ('/api/tax-forms/', '/api/tax-forms/export/', '/api/tax-forms/statistics/'):
+            primary, replica = self.request('get', url)
+            self.assertEqual(primary, 0, url)
+            self.assertGreater(replica, 0, url)
+
+    def test_changed_since_uses_primary(self):
+        url = f'/api/tax-forms/changed-since/?since={timezone.now():%Y-%m-%dT%H:%M:%SZ}'
+        self.assertEqual(self.request('get', url)[1], 0)
+
+    def test_detail_reads_and_writes_use_primary(self):
+        url = f'/api/tax-forms/{self.form.id}/'
+        self.assertEqual(self.request('get', url)[1], 0)
+        self.assertEqual(self.request('patch', url, data={'taxpayer_name': '新名称'}, format='json')[1], 0)
+
+    def test_reads_after_write_stay_on_primary(self):
+        with replica_reads():
+            self.assertEqual(router.db_for_read(TaxForm), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(TaxForm), DEFAULT_DB_ALIAS)
+            TaxForm.objects.filter(id=self.form.id).touch()
+            self.assertEqual(router.db_for_read(TaxForm), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(TaxForm), DEFAULT_DB_ALIAS)
+
+
+class WideLedgerMigrationTest(TransactionTestCase):
+    """0010/0011 把原一对一子表合并到表单本身，回滚后重新拆分为子表"""
+    legacy = [('tax_forms', '0009_assignments')]
+
+    @property
+    def latest(self):
+        # 回到迁移图的最新节点，后续新增迁移后其他测试仍能看到完整的表结构
+        return MigrationExecutor(connection).loader.graph.leaf_nodes()
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(self.latest)
+        super().tearDown()
+
+    def test_sections_are_merged_and_split_back(self):
+        apps = self.migrate(self.legacy)
+        model = functools.partial(apps.get_model, 'tax_forms')
+        form = model('TaxForm').objects.create(month='202503', taxpayer_name='旧表单')
+        model('TaxInfo').objects.create(tax_form=form, outstanding_tax=Decimal('12.50'))
+        dm = model('DailyManagement').objects.create(tax_form=form, invoice_control='控票中')
+        model('Interview').objects.create(daily_management=dm, document='约谈')
+        model('RiskAlert').objects.create(daily_management=dm, document='提醒')
+        model('Collection').objects.create(tax_form=form, freezing='已冻结')
+        model('TaxPaymentWithAssets').objects.create(tax_form=form)
+
+        self.migrate(self.latest)
+        data = TaxFormSerializer(TaxForm.objects.with_related().get(id=form.id)).data
+        self.assertEqual(data['tax_info']['outstanding_tax'], '12.50')
+        self.assertEqual(data['daily_management']['invoice_control'], '控票中')
+        self.assertEqual(data['daily_management']['interview']['document'], '约谈')
+        self.assertIsNone(data['daily_management']['tax_payment_plan'])
+        self.assertEqual([a['document'] for a in data['daily_management']['risk_alerts']], ['提醒'])
+        self.assertEqual(data['collection']['freezing'], '已冻结')
+
+        apps = self.migrate(self.legacy)
+        model = functools.partial(apps.get_model, 'tax_forms')
+        self.assertEqual(model('TaxInfo').objects.get(tax_form_id=form.id).outstanding_tax, Decimal('12.50'))
+        self.assertEqual(model('Interview').objects.get().daily_management.tax_form_id, form.id)
+        self.assertFalse(model('TaxPaymentPlan').objects.exists())
+        self.assertEqual(model('RiskAlert').objects.get().daily_management.invoice_control, '控票中')
+        self.assertEqual(model('Collection').objects.get().freezing, '已冻结')
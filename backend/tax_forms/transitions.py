@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .assignments import FormAssigner
+from .models import TaxForm
+
+# 操作 -> (允许的当前状态, 目标状态)
+TRANSITIONS = {
+    'assign': ({'draft', 'assigned'}, 'assigned'),
+    'submit': ({'draft', 'assigned'}, 'submitted'),
+    'approve': ({'submitted'}, 'approved'),
+    # 退回后有负责人的回到“已分配”，没有的回到草稿
+    'reopen': ({'submitted', 'approved'}, None),
+}
+
+# 仅管理员可执行的操作
+ADMIN_ONLY_TRANSITIONS = {'assign', 'approve', 'reopen'}
+
+NOT_FOUND = '表单不存在'
+
+
+class TransitionError(Exception):
+    """不支持的操作或缺少参数"""
+
+
+class StatusTransition:
+    """
+    批量变更表单状态。
+
+    先读取各表单的当前状态逐个判断能否变更，再对每个目标状态执行一条
+    带 status 条件的 UPDATE，期间被他人改变状态的表单不会被覆盖，结果中标为冲突。
+    返回每张表单的结果，单张表单失败不影响其他表单。
+    """
+
+    def __init__(self, action, assignee=None, assigned_by=None):
+        if action not in TRANSITIONS:
+            raise TransitionError(f'不支持的操作: {action}')
+        if action == 'assign' and assignee is None:
+            raise TransitionError('分配时必须指定负责人')
+        self.action = action
+        self.sources, self.target = TRANSITIONS[action]
+        self.assignee = assignee
+        self.assigned_by = assigned_by
+
+    def apply(self, queryset, form_ids):
+        """queryset 为当前用户可见的表单，返回 {表单ID: 结果}"""
+        labels = dict(TaxForm.STATUS_CHOICES)
+        results = {pk: {'ok': False, 'error': NOT_FOUND} for pk in form_ids}
+        now = timezone.now()
+        with transaction.atomic():
+            current = dict(queryset.filter(id__in=form_ids).select_for_update()
+                           .values_list('id', 'status'))
+            eligible = []
+            for pk, status in current.items():
+                if status in self.sources:
+                    eligible.append(pk)
+                else:
+                    results[pk] = {'ok': False, 'status': status,
+                                   'error': f'表单状态为“{labels.get(status, status)}”，不能执行该操作'}
+
+            for target, ids in self.targets(eligible).items():
+                forms = TaxForm.objects.filter(id__in=ids, status__in=self.sources)
+                if forms.update(status=target, updated_at=now, version=F('version') + 1) == len(ids):
+                    changed = set(ids)
+                else:
+                    changed = set(TaxForm.objects.filter(id__in=ids, status=target, updated_at=now)
+                                  .values_list('id', flat=True))
+                for pk in ids:
+                    results[pk] = {'ok': True, 'status': target} if pk in changed \
+                        else {'ok': False, 'error': '表单状态已被他人修改，请刷新后重试'}
+
+            if self.action == 'assign':
+                assigned = [pk for pk, result in results.items() if result['ok']]
+                FormAssigner(self.assignee, self.assigned_by).assign(assigned)
+        return results
+
+    def targets(self, form_ids):
+        """目标状态 -> 表单ID"""
+        if not form_ids:
+            return {}
+        if self.target is not None:
+            return {self.target: form_ids}
+        # 与 FormAssigner 一致：有表单分配记录或所属主管税务机关已分配负责人的表单视为已分配
+        assigned = set(form_ids) - set(FormAssigner.unassigned(form_ids).values_list('id', flat=True))
+        targets = {
+            'assigned': [pk for pk in form_ids if pk in assigned],
+            'draft': [pk for pk in form_ids if pk not in assigned],
+        }
+        return {target: ids for target, ids in targets.items() if ids}
@@ -0,0 +1,23 @@
+import contextvars
+from contextlib import contextmanager
+
+_touch_deferred = contextvars.ContextVar('tax_form_touch_deferred', default=False)
+
+
+@contextmanager
+def deferred_touch():
+    """
+    在此范围内保存风险提醒时不单独递增表单版本号。
+
+    用于 TaxFormSerializer 这类会在最后统一保存 TaxForm 的场景，
+    避免每写一条风险提醒就多一条 UPDATE。
+    """
+    token = _touch_deferred.set(True)
+    try:
+        yield
+    finally:
+        _touch_deferred.reset(token)
+
+
+def touch_deferred():
+    return _touch_deferred.get()
@@ -1,26 +1,61 @@
+import codecs
+import hashlib
+from urllib.parse import quote
+
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, status, serializers
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from .models import TaxForm
+from .models import TaxForm, ArrearsSummary, TaxFormTombstone
 from .serializers import TaxFormSerializer
+from .pagination import MonthKeysetPagination
+from .filters import TaxFormFilter, TaxFormOrderingFilter
+from .carry_forward import CarryForward, previous_month, MONTH_RE
+from .assignments import FormAssigner
+from .transitions import ADMIN_ONLY_TRANSITIONS, NOT_FOUND, StatusTransition, TransitionError
+from .bulk import BulkFill
+from .exporters import LedgerExporter
+from .form_cache import SerializedFormCache, get_form_cache
+from .readers import tax_form_reader
+from .importers import RosterImporter, RosterImportError, iter_rows
+from .permissions import IsAdminUserType
+from .routers import ReplicaReadsMixin
+from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-class TaxFormViewSet(viewsets.ModelViewSet):
+class TaxFormViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows tax forms to be viewed or edited.
     """
     queryset = TaxForm.objects.all().order_by('id')
     serializer_class = TaxFormSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MonthKeysetPagination
+    filter_backends = [DjangoFilterBackend, TaxFormOrderingFilter]
+    filterset_class = TaxFormFilter
+    max_default_ids = 1000
+    # 按需字段时始终返回，供缓存和并发控制使用
+    always_selected_fields = ('id', 'version')
+    # 配置了只读副本时从副本读取的 action，单张表单的读取和编辑仍在主库，保证读到刚保存的数据；
+    # 增量同步的游标按主库时间计算，副本延迟时会永久漏掉修改，因此也留在主库
+    replica_actions = ('list', 'export', 'statistics')
     
     def get_queryset(self):
-        """根据用户类型过滤数据"""
+        """根据用户类型过滤数据，并一次性加载嵌套数据以避免 N+1 查询"""
         user = self.request.user
         if user.user_type == 'admin':
-            return TaxForm.objects.all().order_by('id')
+            queryset = TaxForm.objects.all().order_by('id')
         else:
-            # 普通用户只能看到自己的表单
-            return TaxForm.objects.order_by('id')
+            # 普通用户只能看到分配给自己的表单
+            queryset = TaxForm.objects.assigned_to(user, self.request.query_params.get('month')).order_by('id')
+        return queryset.with_related()
     
     def perform_create(self, serializer):
         """创建表单时添加时间戳，移除created_by"""
@@ -43,8 +78,123 @@ class TaxFormViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    def get_field_selection(self):
+        """
+        解析按需字段参数，如 ?fields=taxpayer_name,daily_management.invoice_control&expand=collection
+
+        fields 为逗号分隔的字段路径，路径为嵌套对象名时返回整个对象；expand 为需要完整返回的嵌套对象。
+        只指定 expand 时返回全部非嵌套字段和这些嵌套对象。都未指定时返回 None，即全部字段。
+        """
+        params = self.request.query_params
+        fields = {name.strip() for name in params.get('fields', '').split(',') if name.strip()}
+        expand = {name.strip() for name in params.get('expand', '').split(',') if name.strip()}
+        if not fields and not expand:
+            return None
+        if not fields:
+            fields = {name for name, field in self.get_serializer().fields.items()
+                      if not isinstance(field, serializers.BaseSerializer)}
+        return frozenset(fields | expand | set(self.always_selected_fields))
+
+    def get_reader(self, fields):
+        try:
+            return tax_form_reader(fields)
+        except ValueError as exc:
+            raise serializers.ValidationError({'fields': str(exc)})
+
+    def list(self, request, *args, **kwargs):
+        """列表优先从序列化缓存中取，只有新建或修改过的表单才重新加载，并走只读的快速序列化"""
+        fields = self.get_field_selection()
+        reader = self.get_reader(fields)
+        # 缓存中是完整的表单数据，按需字段时直接查询
+        form_cache = get_form_cache() if fields is None else SerializedFormCache(None)
+        queryset = self.filter_queryset(self.get_queryset())
+        # 先只查询 id/version（以及分页游标需要的 month），确定本页有哪些表单；
+        # 取具名元组而不是模型实例，省去逐行构造实例的开销
+        keys = queryset.select_related(None).prefetch_related(None) \
+            .values_list('pk', 'version', 'month', named=True)
+        page = self.paginate_queryset(keys)
+        forms = page if page is not None else list(keys)
+
+        def serialize(ids):
+            # ids 已经过过滤和权限检查，这里只按主键查询，避免重复执行过滤条件
+            return reader.read(TaxForm.objects.filter(id__in=ids))
+
+        data = form_cache.render(forms, serialize)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @staticmethod
+    def make_etag(pk, version, fields=None):
+        """强 ETag，由表单ID和版本号组成；按需字段的响应内容不同，附加字段选择的短哈希"""
+        if fields is None:
+            return f'"{pk}-{version}"'
+        digest = hashlib.sha1(','.join(sorted(fields)).encode()).hexdigest()[:8]
+        return f'"{pk}-{version}-{digest}"'
+
+    @staticmethod
+    def parse_etags(header):
+        return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+    def retrieve(self, request, *args, **kwargs):
+        """带 If-None-Match 且版本未变时直接返回 304，不加载和序列化嵌套数据"""
+        pk = kwargs.get(self.lookup_field)
+        fields = self.get_field_selection()
+        # 先校验字段参数，无效的字段路径即使版本未变也返回 400
+        reader = self.get_reader(fields) if fields is not None else None
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            version = self.filter_queryset(self.get_queryset()).filter(pk=pk) \
+                .values_list('version', flat=True).first()
+            etag = self.make_etag(pk, version, fields)
+            if version is not None and (etag in self.parse_etags(if_none_match) or if_none_match.strip() == '*'):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if fields is None:
+            response = super().retrieve(request, *args, **kwargs)
+        else:
+            data = reader.read(self.filter_queryset(self.get_queryset()).filter(pk=pk))
+            if not data:
+                raise Http404
+            response = Response(data[0])
+        response['ETag'] = self.make_etag(response.data['id'], response.data['version'], fields)
+        return response
+
+    def lock_if_match(self, if_match):
+        """
+        校验 If-Match 并锁定表单行。
+
+        用一条 UPDATE ... WHERE version = 期望版本 的空更新同时完成比较和加锁，
+        锁一直持有到事务结束，并发的修改请求会在此排队并在版本变化后得到 412。
+        """
+        pk = self.kwargs.get(self.lookup_field)
+        forms = TaxForm.objects.filter(pk=pk)
+        if if_match.strip() == '*':
+            return forms.update(version=F('version')) > 0
+        versions = []
+        for etag in self.parse_etags(if_match):
+            # 按需字段响应的 ETag 末尾带字段哈希，版本号同样有效
+            form_id, _, version = etag.strip('"').partition('-')
+            version = version.partition('-')[0]
+            if form_id == str(pk) and version.isdigit():
+                versions.append(int(version))
+        return bool(versions) and forms.filter(version__in=versions).update(version=F('version')) > 0
+
     def update(self, request, *args, **kwargs):
-        """重写更新方法，支持部分更新"""
+        """重写更新方法，支持部分更新；带 If-Match 请求头时进行乐观并发控制"""
+        with transaction.atomic():
+            return self.update_form(request, *args, **kwargs)
+
+    def update_form(self, request, *args, **kwargs):
+        if_match = request.headers.get('If-Match')
+        if if_match is not None and not self.lock_if_match(if_match):
+            self.get_object()  # 表单不存在时返回 404
+            return Response({
+                'status': 'error',
+                'message': '表单已被他人修改，请刷新后重试',
+                'form_id': kwargs.get('pk'),
+            }, status=status.HTTP_412_PRECONDITION_FAILED)
+
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
@@ -65,4 +215,311 @@ class TaxFormViewSet(viewsets.ModelViewSet):
             # 清除预获取缓存
             instance._prefetched_objects_cache = {}
             
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': self.make_etag(instance.pk, instance.version)})
+
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser], permission_classes=[IsAdminUserType])
+    def import_roster(self, request):
+        """管理员上传 CSV/XLSX 名单，流式分批导入"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': '请上传名单文件'}, status=status.HTTP_400_BAD_REQUEST)
+
+        encoding = request.data.get('encoding') or 'utf-8-sig'
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return Response({'error': f'不支持的编码: {encoding}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = RosterImporter(month=request.data.get('month') or None)
+        try:
+            result = importer.run(iter_rows(upload, upload.name, encoding))
+        except (RosterImportError, UnicodeDecodeError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='carry-forward', permission_classes=[IsAdminUserType])
+    def carry_forward(self, request):
+        """一键结转上月欠税余额大于 0 的表单到指定月度"""
+        month = request.data.get('month') or timezone.now().strftime('%Y%m')
+        try:
+            result = CarryForward(month, request.data.get('source_month') or None).run()
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    @action(detail=False, methods=['get'], url_path='previous-defaults')
+    def previous_defaults(self, request):
+        """
+        批量获取上月同一信用代码表单的数据作为默认值，如 ?ids=1,2,3
+
+        不跨年：1 月份的表单不使用上一年 12 月的数据。
+        返回 {表单ID: 上月表单数据或 null}。
+        """
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            return Response({'error': 'ids 参数格式错误'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_default_ids:
+            return Response({'error': f'一次最多查询 {self.max_default_ids} 张表单'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        keys = {}
+        for pk, credit_code, month in self.get_queryset().filter(id__in=ids).values_list('id', 'credit_code', 'month'):
+            if credit_code and month and MONTH_RE.match(month) and not month.endswith('01'):
+                keys[pk] = (credit_code, previous_month(month))
+
+        previous = {}
+        if keys:
+            # 单次查询，由 (credit_code, month) 复合索引支撑；同一信用代码有多张表单时取最新一张。
+            # 已校验过对所查表单的访问权限，上月表单不要求同样分配给当前用户
+            candidates = TaxForm.objects.with_related().order_by('id').filter(
+                credit_code__in={code for code, _ in keys.values()},
+                month__in={month for _, month in keys.values()},
+            )
+            for form in candidates:
+                previous[(form.credit_code, form.month)] = form
+
+        serializer = self.get_serializer(list(previous.values()), many=True)
+        rendered = {form.id: data for form, data in zip(previous.values(), serializer.data)}
+        return Response({
+            pk: rendered[previous[keys[pk]].id] if keys.get(pk) in previous else None
+            for pk in ids
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        多单元格填充：把同一组字段值写入多张表单。
+
+        请求体：{"ids": [1, 2], "values": {"daily_management.invoice_control": "控票中"}}，
+        也可以用 "filter": {"month": "202503"} 代替 ids，或用 "field"/"value" 指定单个字段。
+        """
+        values = request.data.get('values')
+        if values is None and 'field' in request.data:
+            values = {request.data['field']: request.data.get('value')}
+        if not isinstance(values, dict):
+            return Response({'error': '请提供 values 或 field/value'}, status=status.HTTP_400_BAD_REQUEST)
+
+        base = self.get_queryset()
+        if 'ids' in request.data:
+            ids = request.data['ids']
+            if not isinstance(ids, list):
+                return Response({'error': 'ids 必须是列表'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                ids = [int(pk) for pk in ids]
+            except (TypeError, ValueError):
+                return Response({'error': 'ids 必须是表单ID列表'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = base.filter(id__in=ids)
+        elif isinstance(request.data.get('filter'), dict):
+            filterset = TaxFormFilter(data=request.data['filter'], queryset=base, request=request)
+            if not filterset.is_valid():
+                return Response({'errors': filterset.errors}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = filterset.qs
+        else:
+            return Response({'error': '请提供 ids 或 filter'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            fill = BulkFill(values, is_admin=request.user.user_type == 'admin')
+        except serializers.ValidationError as exc:
+            return Response({'errors': exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        form_ids = list(queryset.values_list('id', flat=True))
+        updated_at = serializers.DateTimeField().to_representation(fill.apply(form_ids))
+        return Response({
+            'updated': len(form_ids),
+            'updated_at': {pk: updated_at for pk in form_ids},
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-assign', permission_classes=[IsAdminUserType])
+    def bulk_assign(self, request):
+        """
+        批量分配负责人：{"assignee": 3, "ids": [1, 2]}，
+        或按主管税务机关分配：{"assignee": 3, "tax_authority_codes": ["13305033100"]}。
+
+        assignee 为 null 时取消分配。草稿表单分配后变为“已分配”。
+        """
+        if 'assignee' not in request.data:
+            return Response({'error': '请提供 assignee'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = request.data.get('ids', [])
+        codes = request.data.get('tax_authority_codes', [])
+        if not isinstance(ids, list) or not isinstance(codes, list):
+            return Response({'error': 'ids 和 tax_authority_codes 必须是列表'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids and not codes:
+            return Response({'error': '请提供 ids 或 tax_authority_codes'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids 必须是表单ID列表'}, status=status.HTTP_400_BAD_REQUEST)
+
+        field = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.filter(is_active=True),
+                                                   allow_null=True)
+        try:
+            assignee = field.run_validation(request.data['assignee'])
+        except serializers.ValidationError as exc:
+            return Response({'errors': {'assignee': exc.detail}}, status=status.HTTP_400_BAD_REQUEST)
+
+        assigner = FormAssigner(assignee, assigned_by=request.user)
+        return Response({
+            'assignee': assignee.pk if assignee else None,
+            'ids': assigner.assign(ids) if ids else [],
+            'tax_authority_codes': assigner.assign_authorities(codes) if codes else [],
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-transition')
+    def bulk_transition(self, request):
+        """
+        批量变更表单状态：{"action": "approve", "ids": [1, 2]}
+
+        action 可选 assign（需同时提供 assignee）、submit、approve、reopen，
+        返回每张表单的结果，部分表单失败时其余表单照常变更。
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids 必须是非空列表'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids 必须是表单ID列表'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.transition(request, request.data.get('action'), ids)
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """提交单张表单"""
+        return self.transition_one(request, 'submit', pk)
+
+    @action(detail=True, methods=['post'])
+    def approve(self, request, pk=None):
+        """审批单张表单"""
+        return self.transition_one(request, 'approve', pk)
+
+    @action(detail=True, methods=['post'])
+    def reopen(self, request, pk=None):
+        """退回单张表单"""
+        return self.transition_one(request, 'reopen', pk)
+
+    def transition(self, request, name, ids):
+        if name in ADMIN_ONLY_TRANSITIONS and request.user.user_type != 'admin':
+            return Response({'error': '仅管理员可执行该操作'}, status=status.HTTP_403_FORBIDDEN)
+        assignee = None
+        if name == 'assign':
+            field = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.filter(is_active=True))
+            try:
+                assignee = field.run_validation(request.data.get('assignee'))
+            except serializers.ValidationError as exc:
+                return Response({'errors': {'assignee': exc.detail}}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            transition = StatusTransition(name, assignee=assignee, assigned_by=request.user)
+        except TransitionError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = transition.apply(self.get_queryset(), ids)
+        return Response({
+            'updated': sum(result['ok'] for result in results.values()),
+            'results': results,
+        })
+
+    def transition_one(self, request, name, pk):
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        response = self.transition(request, name, [pk])
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        result = response.data['results'][pk]
+        if result['ok']:
+            return Response({'id': pk, **result})
+        if result['error'] == NOT_FOUND:
+            raise Http404
+        return Response({'id': pk, **result}, status=status.HTTP_409_CONFLICT)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        导出台账，支持与列表相同的过滤和排序参数。
+
+        ?export_format=csv（默认）边查询边输出；?export_format=xlsx 以只写模式生成后下载。
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        exporter = LedgerExporter(self.filter_queryset(self.get_queryset()))
+        filename = f"台账{request.query_params.get('month', '')}"
+
+        if export_format == 'csv':
+            response = StreamingHttpResponse(exporter.iter_csv(), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}.csv"
+            return response
+        if export_format == 'xlsx':
+            try:
+                output = exporter.write_xlsx()
+            except ImportError:
+                return Response({'error': '导出 XLSX 需要安装 openpyxl'}, status=status.HTTP_400_BAD_REQUEST)
+            return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+        return Response({'error': f'不支持的导出格式: {export_format}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='statistics')
+    def statistics(self, request):
+        """
+        欠税汇总统计，直接读取预先计算的月度汇总表。
+
+        ?month=202503 或 ?month_from=202501&month_to=202503 限定月度范围，
+        ?group_by=month,tax_authority_name 指定分组维度（默认全部维度）。
+        """
+        group_by = [d for d in request.query_params.get('group_by', '').split(',') if d] \
+            or ArrearsSummary.dimensions
+        invalid = set(group_by) - set(ArrearsSummary.dimensions)
+        if invalid:
+            return Response({'error': f"不支持的分组维度: {', '.join(sorted(invalid))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ArrearsSummary.objects.all()
+        params = request.query_params
+        if params.get('month'):
+            queryset = queryset.filter(month=params['month'])
+        if params.get('month_from'):
+            queryset = queryset.filter(month__gte=params['month_from'])
+        if params.get('month_to'):
+            queryset = queryset.filter(month__lte=params['month_to'])
+
+        rows = queryset.values(*group_by).annotate(
+            form_count=Sum('form_count'),
+            outstanding_tax=Sum('outstanding_tax'),
+            collection_effect=Sum('collection_effect'),
+        ).order_by(*group_by)
+        return Response(list(rows))
+
+    @action(detail=False, methods=['get'], url_path='changed-since')
+    def changed_since(self, request):
+        """
+        增量同步：返回 since 之后修改过的表单及已删除的表单ID，如 ?since=2025-03-01T08:00:00Z
+
+        支持与列表相同的过滤参数。客户端下次请求时使用响应中的 timestamp 作为 since。
+
+        updated_at 在写事务提交前取值，晚提交的修改其时间戳可能早于本次查询时间，
+        因此 timestamp 比当前时间早 SYNC_OVERLAP，重叠窗口内的表单会再次返回，
+        客户端按 version 丢弃不比本地新的数据。deleted 为已删除或不再分配给当前用户的表单，
+        只按月度和可见范围过滤，客户端忽略本地没有的ID；since 早于删除记录的保留期限时返回 410，需要全量同步。
+        """
+        since = parse_datetime(request.query_params.get('since', ''))
+        if since is None:
+            return Response({'error': 'since 参数应为 ISO 8601 时间'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        now = timezone.now()
+        if since < now - settings.TOMBSTONE_RETENTION:
+            return Response({'error': '同步间隔超过删除记录的保留期限，请重新全量同步'}, status=status.HTTP_410_GONE)
+
+        changed = self.filter_queryset(self.get_queryset()).filter(updated_at__gt=since)
+        deleted = TaxFormTombstone.objects.visible_to(request.user).filter(deleted_at__gt=since)
+        month = request.query_params.get('month')
+        if month:
+            deleted = deleted.filter(month=month)
+        deleted = set(deleted.values_list('form_id', flat=True))
+        # 换了负责人的表单也会为原负责人记录删除，仍然可见的表单不算删除（如又分配回来）
+        deleted -= set(self.get_queryset().filter(id__in=deleted).values_list('id', flat=True))
+        return Response({
+            'timestamp': serializers.DateTimeField().to_representation(now - settings.SYNC_OVERLAP),
+            'changed': self.get_reader(self.get_field_selection()).read(changed),
+            'deleted': sorted(deleted),
+        })